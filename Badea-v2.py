@@ -1,7 +1,6 @@
 import streamlit as st
 import PyPDF2
 import json
-import base64
 from datetime import datetime
 from openai import OpenAI
 from typing import Dict, Any, List
@@ -12,15 +11,15 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from io import BytesIO
 from html import unescape
 import os
-import requests
 from PIL import Image as PILImage
 from typing import Union, Optional
 import io
+import hashlib
+from engine import ANALYSIS_DEADLINE, prepare_image_for_vision
+from resilience import create_chat_completion
 
 
 def process_image_input(image_file, client: OpenAI) -> str:
@@ -28,10 +27,11 @@ def process_image_input(image_file, client: OpenAI) -> str:
     try:
         # Read and encode image
         image_bytes = image_file.read()
-        image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+        image_base64, mime_type, detail = prepare_image_for_vision(image_bytes)
         
         # Get image description using GPT-4 Vision
-        response = client.chat.completions.create(
+        response = create_chat_completion(
+            client,
             model="gpt-4o-mini",
             messages=[
                 {
@@ -44,8 +44,8 @@ def process_image_input(image_file, client: OpenAI) -> str:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}",
-                                "detail": "high"
+                                "url": f"data:{mime_type};base64,{image_base64}",
+                                "detail": detail
                             }
                         }
                     ]
@@ -68,11 +68,6 @@ def process_input_content(input_type: str, uploaded_file, text_input: str, clien
             return read_pdf(uploaded_file) or ""
         elif input_type == "Image" and uploaded_file:
             try:
-                # Display the uploaded image using PIL
-                image = PILImage.open(uploaded_file)
-                st.image(image, caption="Uploaded Image", use_container_width=True)
-                # Reset file pointer and process image
-                uploaded_file.seek(0)
                 return process_image_input(uploaded_file, client)
             except Exception as e:
                 st.error(f"Error processing image: {str(e)}")
@@ -83,23 +78,32 @@ def process_input_content(input_type: str, uploaded_file, text_input: str, clien
     except Exception as e:
         st.error(f"Error processing input: {str(e)}")
         return ""
-def download_and_register_fonts():
-    """Download and register required fonts"""
-    font_urls = {
-        'Lato-Regular': "https://github.com/google/fonts/raw/main/ofl/lato/Lato-Regular.ttf",
-        'Lato-Bold': "https://github.com/google/fonts/raw/main/ofl/lato/Lato-Bold.ttf"
-    }
-    
-    for font_name, url in font_urls.items():
-        font_path = f"{font_name}.ttf"
-        try:
-            if not os.path.exists(font_path):
-                response = requests.get(url)
-                with open(font_path, 'wb') as f:
-                    f.write(response.content)
-            pdfmetrics.registerFont(TTFont(font_name, font_path))
-        except Exception as e:
-            st.error(f"Error loading font {font_name}: {str(e)}")
+
+def ingest_upload(input_type: str, uploaded_file, client: OpenAI) -> str:
+    """Extract text from an upload exactly once per session.
+
+    Streamlit reruns the whole script on every widget interaction while the
+    file stays in the uploader, so extraction results are stored in
+    ``st.session_state.ingested`` keyed by upload identity, with the content
+    hash letting a re-upload of the same bytes reuse the stored text.
+    """
+    if 'ingested' not in st.session_state:
+        st.session_state.ingested = {}
+    ingested = st.session_state.ingested
+
+    identity = (input_type, getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}")
+    entry = ingested.get(identity)
+    if entry is None:
+        content_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        entry = next((e for e in ingested.values() if e['content_hash'] == content_hash), None)
+        if entry is None:
+            content = process_input_content(input_type, uploaded_file, "", client)
+            if not content:
+                # Don't remember failures, so the next rerun can try again
+                return ""
+            entry = {'content_hash': content_hash, 'content': content}
+        ingested[identity] = entry
+    return entry['content']
 
 def create_styles() -> Dict[str, ParagraphStyle]:
     """Create styles using reliable system fonts for Streamlit cloud environment"""
@@ -154,9 +158,6 @@ def create_styled_pdf_report(result: Dict[str, Any], analysis_type: str) -> byte
     buffer = BytesIO()
     
     try:
-        # Download and register fonts
-        download_and_register_fonts()
-        
         # Create PDF document
         doc = SimpleDocTemplate(
             buffer,
@@ -866,7 +867,8 @@ def summarize_chunks(chunks: List[str], client: OpenAI) -> str:
     for i, chunk in enumerate(chunks):
         try:
             st.info(f"Summarizing chunk {i+1} of {len(chunks)}...")
-            response = client.chat.completions.create(
+            response = create_chat_completion(
+                client,
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "Summarize the following text while preserving key facts, figures, and insights:For each point and section, make sure you provide in depth statistics, supporting facts, figures to support each assertion, as well as quoting the sources from where the data is obtained. From the data provided, contextualise and synthesize with the analysis."},
@@ -1018,7 +1020,9 @@ def analyze_with_retry(text: str, analysis_type: str, prompt: str) -> Dict[str,
             chunks = chunk_text(text)
             text = summarize_chunks(chunks, client)
         
-        response = client.chat.completions.create(
+        response = create_chat_completion(
+            client,
+            deadline=ANALYSIS_DEADLINE,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": create_professional_system_prompt()},
@@ -1181,11 +1185,14 @@ def main():
         if input_type == "PDF Document":
             uploaded_file = st.file_uploader("Upload PDF", type=['pdf'])
             if uploaded_file:
-                st.session_state.processed_content = process_input_content(input_type, uploaded_file, "", st.session_state['client'])
+                st.session_state.processed_content = ingest_upload(input_type, uploaded_file, st.session_state['client'])
         elif input_type == "Image":
             uploaded_file = st.file_uploader("Upload Image", type=['png', 'jpg', 'jpeg'])
             if uploaded_file:
-                st.session_state.processed_content = process_input_content(input_type, uploaded_file, "", st.session_state['client'])
+                image = PILImage.open(uploaded_file)
+                st.image(image, caption="Uploaded Image", use_container_width=True)
+                uploaded_file.seek(0)
+                st.session_state.processed_content = ingest_upload(input_type, uploaded_file, st.session_state['client'])
         else:
             with st.form(key='text_input_form'):
                 text_input = st.text_area("Enter text for analysis", height=200)
@@ -0,0 +1,247 @@
+"""Generate reports for a folder of documents without the web app.
+
+    python batch.py INPUT_DIR [--output-dir DIR] [--workers N] [--analyses TYPE ...] [--force]
+
+Every PDF, image or text file in INPUT_DIR becomes one report PDF and one
+JSON result in the output directory. The JSON is written last, so a run
+that is interrupted can simply be started again: inputs whose report is
+complete and whose content hasn't changed are skipped. The OpenAI key is
+read from --api-key or OPENAI_API_KEY.
+"""
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from openai import OpenAI
+
+import engine
+
+INPUT_TYPES = {
+    '.pdf': "PDF Document",
+    '.png': "Images",
+    '.jpg': "Images",
+    '.jpeg': "Images",
+    '.txt': "Text Input",
+    '.md': "Text Input",
+}
+DEFAULT_WORKERS = 2
+DEFAULT_OUTPUT_DIR = 'reports'
+
+
+def find_inputs(input_dir: str) -> List[str]:
+    """Supported files directly inside ``input_dir``, by name."""
+    paths = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in INPUT_TYPES:
+            paths.append(path)
+    return paths
+
+
+def output_names(paths: List[str]) -> Dict[str, str]:
+    """Report base name per input: the file stem, or the full file name where stems collide."""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    return {
+        path: stem if stems.count(stem) == 1 else os.path.basename(path).replace('.', '_')
+        for path, stem in zip(paths, stems)
+    }
+
+
+def write_atomically(path: str, data: bytes) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def is_complete(json_path: str, pdf_path: str, content_hash: str, targets: List[str]) -> bool:
+    """Whether an earlier run already produced a full report for this exact input."""
+    if not (os.path.exists(json_path) and os.path.exists(pdf_path)):
+        return False
+    try:
+        with open(json_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        previous.get('content_hash') == content_hash
+        and previous.get('analyses') == targets
+        and not previous.get('errors')
+    )
+
+
+def document_notify(path: str) -> engine.Notify:
+    """Engine notify callback that prints a document's warnings and errors, tagged with its name."""
+    def notify(level, message):
+        if level != 'info':
+            print(f"  {os.path.basename(path)}: {message}", file=sys.stderr)
+    return notify
+
+
+def extract_content(path: str, data: bytes, client: OpenAI, notify: engine.Notify) -> str:
+    """Text for analysis, through the same extraction the app uses for uploads."""
+    input_type = INPUT_TYPES[os.path.splitext(path)[1].lower()]
+    if input_type == "Text Input":
+        return engine.process_input_content(input_type, None, data.decode('utf-8', errors='replace'), client,
+                                            notify=notify)
+    upload = io.BytesIO(data)
+    upload.name = os.path.basename(path)
+    files = [upload] if input_type == "Images" else upload
+    return engine.process_input_content(input_type, files, "", client, notify=notify)
+
+
+def build_result(sections: Dict[str, Dict[str, Any]], targets: List[str]) -> Optional[Dict[str, Any]]:
+    """A single analysis result, or a board pack when several analyses were requested."""
+    if not sections:
+        return None
+    if len(targets) == 1:
+        return sections[targets[0]]
+    return engine.make_board_pack(sections)
+
+
+def process_document(path: str, name: str, output_dir: str, targets: List[str],
+                     client: OpenAI, force: bool) -> Dict[str, Any]:
+    """Extract, analyse and render one input; returns its outcome and stage timings."""
+    outcome = {'path': path, 'status': 'done', 'timings': {}, 'errors': {}}
+    pdf_path = os.path.join(output_dir, f"{name}.pdf")
+    json_path = os.path.join(output_dir, f"{name}.json")
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    if not force and is_complete(json_path, pdf_path, content_hash, targets):
+        outcome['status'] = 'skipped'
+        return outcome
+
+    notify = document_notify(path)
+    started = time.perf_counter()
+    content = extract_content(path, data, client, notify)
+    outcome['timings']['extract'] = time.perf_counter() - started
+    if not content:
+        outcome['status'] = 'failed'
+        outcome['errors']['input'] = "No text could be extracted"
+        return outcome
+
+    started = time.perf_counter()
+    errors = {}
+    # Several analyses make a board pack, written concurrently like the app's
+    sections = engine.run_analysis_graph(content, targets, client, force=force,
+                                         on_error=lambda t, e: errors.setdefault(t, str(e)), notify=notify,
+                                         build_on_upstream=len(targets) == 1)
+    outcome['timings']['analyse'] = time.perf_counter() - started
+    # Dependencies that only fed the requested analyses are not part of the report
+    sections = {t: result for t, result in sections.items() if t in targets}
+    outcome['errors'].update({t: error for t, error in errors.items() if t in targets})
+
+    result = build_result(sections, targets)
+    if result is None:
+        outcome['status'] = 'failed'
+        return outcome
+
+    started = time.perf_counter()
+    pdf_bytes = engine.render_result_pdf(result, notify)
+    outcome['timings']['render'] = time.perf_counter() - started
+    if not pdf_bytes:
+        outcome['status'] = 'failed'
+        outcome['errors']['render'] = "The report PDF could not be created"
+        return outcome
+
+    write_atomically(pdf_path, pdf_bytes)
+    record = {
+        'source': os.path.basename(path),
+        'content_hash': content_hash,
+        'analyses': targets,
+        'errors': outcome['errors'],
+        'result': result
+    }
+    write_atomically(json_path, json.dumps(record, indent=2, ensure_ascii=False).encode('utf-8'))
+    if outcome['errors']:
+        outcome['status'] = 'partial'
+    return outcome
+
+
+def print_summary(outcomes: List[Dict[str, Any]], elapsed: float) -> None:
+    counts = {}
+    stage_totals = {}
+    for outcome in outcomes:
+        counts[outcome['status']] = counts.get(outcome['status'], 0) + 1
+        for stage, seconds in outcome['timings'].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    processed = len(outcomes) - counts.get('skipped', 0)
+    rate = processed / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"\n{len(outcomes)} inputs in {elapsed:.1f}s, {rate:.2f} documents/min processed")
+    print("  " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    if processed:
+        print("  mean per document: " + ", ".join(
+            f"{stage} {total / processed:.1f}s" for stage, total in stage_totals.items()
+        ))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate report PDFs for a folder of documents.")
+    parser.add_argument('input_dir', help="folder of PDF, image (png/jpg) or text (txt/md) files")
+    parser.add_argument('--output-dir', help=f"where reports are written (default: INPUT_DIR/{DEFAULT_OUTPUT_DIR})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"documents processed at the same time (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--analyses', nargs='+', choices=list(engine.ANALYSIS_PROMPTS),
+                        default=list(engine.ANALYSIS_PROMPTS),
+                        help="analyses to run (default: all four, as a board pack)")
+    parser.add_argument('--force', action='store_true',
+                        help="redo inputs with a complete report and regenerate cached analyses")
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'),
+                        help="OpenAI key (default: OPENAI_API_KEY)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.api_key:
+        print("No OpenAI key: pass --api-key or set OPENAI_API_KEY", file=sys.stderr)
+        return 2
+    output_dir = args.output_dir or os.path.join(args.input_dir, DEFAULT_OUTPUT_DIR)
+    if os.path.abspath(output_dir) == os.path.abspath(args.input_dir):
+        # Reports would be picked up as inputs by the next run
+        print("The output directory must differ from the input directory", file=sys.stderr)
+        return 2
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = find_inputs(args.input_dir)
+    if not paths:
+        print(f"No PDF, image or text files found in {args.input_dir}", file=sys.stderr)
+        return 1
+    names = output_names(paths)
+    # Keep the app's board pack order whatever order the analyses were given in
+    targets = [t for t in engine.ANALYSIS_PROMPTS if t in args.analyses]
+    client = OpenAI(api_key=args.api_key)
+
+    outcomes = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='batch') as executor:
+        futures = {
+            executor.submit(process_document, path, names[path], output_dir, targets, client, args.force): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {'path': path, 'status': 'failed', 'timings': {}, 'errors': {'input': str(e)}}
+            outcomes.append(outcome)
+            details = "; ".join(f"{key}: {error}" for key, error in outcome['errors'].items())
+            print(f"[{len(outcomes)}/{len(paths)}] {outcome['status']:<7} {os.path.basename(path)}"
+                  + (f" ({details})" if details else ""))
+
+    print_summary(outcomes, time.perf_counter() - started)
+    return 1 if any(o['status'] == 'failed' for o in outcomes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Benchmark splitting a long document into summary chunks.
+
+    python bench_chunking.py [--tokens N] [--chunk-tokens N] [--runs N]
+
+Builds a synthetic report of roughly N tokens (prose paragraphs, markdown
+tables, page breaks), then times tokenizing it, the old chunker that appended
+tokens one at a time, and chunk_tokens. Also reports how many cuts land on a
+paragraph boundary, a line break or nowhere in particular.
+"""
+import sys
+import time
+import random
+import argparse
+from typing import Callable, List, Tuple
+
+from engine import PAGE_SEPARATOR, chunk_tokens, get_encoding
+
+DEFAULT_TOKENS = 1_000_000
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_RUNS = 3
+
+WORDS = ("revenue", "margin", "liquidity", "guidance", "exposure", "segment", "capital",
+         "the", "and", "of", "in", "for", "growth", "declined", "increased", "operating")
+
+
+def synthetic_report(target_tokens: int, seed: int = 0) -> str:
+    """Report-like text of about ``target_tokens`` tokens."""
+    rng = random.Random(seed)
+    encoding = get_encoding()
+    pages, total = [], 0
+    while total < target_tokens:
+        blocks = []
+        for _ in range(rng.randint(3, 6)):
+            if rng.random() < 0.2:
+                rows = [f"| {rng.choice(WORDS)} | {rng.randint(1, 999)}.{rng.randint(0, 9)} | {rng.randint(1, 40)}% |"
+                        for _ in range(rng.randint(3, 8))]
+                blocks.append("\n".join(["| Item | FY2024 | Change |", "|---|---|---|"] + rows))
+            else:
+                sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+                             for _ in range(rng.randint(2, 6))]
+                blocks.append(" ".join(sentences))
+        page = "\n\n".join(blocks)
+        pages.append(page)
+        total += len(encoding.encode(page))
+    return PAGE_SEPARATOR.join(pages)
+
+
+def token_by_token_chunks(tokens: List[int], max_chunk_tokens: int) -> List[str]:
+    """The chunker chunk_tokens replaced, kept here as the baseline."""
+    encoding = get_encoding()
+    chunks, current_chunk = [], []
+    for token in tokens:
+        if len(current_chunk) < max_chunk_tokens:
+            current_chunk.append(token)
+        else:
+            chunks.append(encoding.decode(current_chunk))
+            current_chunk = [token]
+    if current_chunk:
+        chunks.append(encoding.decode(current_chunk))
+    return chunks
+
+
+def best_time(fn: Callable[[], object], runs: int) -> Tuple[float, object]:
+    best, result = float('inf'), None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def cut_kinds(chunks: List[str]) -> str:
+    """How each chunk but the last ends."""
+    paragraph = sum(chunk.endswith("\n\n") for chunk in chunks[:-1])
+    line = sum(chunk.endswith("\n") and not chunk.endswith("\n\n") for chunk in chunks[:-1])
+    return f"{paragraph} paragraph, {line} line, {len(chunks) - 1 - paragraph - line} other"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark splitting a long document into summary chunks.")
+    parser.add_argument('--tokens', type=int, default=DEFAULT_TOKENS,
+                        help=f"approximate document size in tokens (default: {DEFAULT_TOKENS})")
+    parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help=f"maximum tokens per chunk (default: {DEFAULT_CHUNK_TOKENS})")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                        help=f"repetitions, best one counts (default: {DEFAULT_RUNS})")
+    args = parser.parse_args(argv)
+    runs = max(1, args.runs)
+
+    text = synthetic_report(args.tokens)
+    encode_time, tokens = best_time(lambda: get_encoding().encode(text), runs)
+    print(f"document: {len(tokens)} tokens, {len(text)} characters")
+    print(f"  encode             {encode_time * 1000:8.1f} ms")
+    for name, chunker in [('token by token', token_by_token_chunks), ('chunk_tokens', chunk_tokens)]:
+        elapsed, chunks = best_time(lambda: chunker(tokens, args.chunk_tokens), runs)
+        print(f"  {name:<18} {elapsed * 1000:8.1f} ms  {len(chunks)} chunks, cuts: {cut_kinds(chunks)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
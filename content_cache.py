@@ -0,0 +1,159 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+# Shared by every Streamlit worker process on the host; override per deployment
+DEFAULT_CACHE_PATH = os.environ.get(
+    'BADEA_CACHE_PATH', os.path.join('.cache', 'content_cache.sqlite3')
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('BADEA_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def make_cache_key(data: bytes, kind: str, model: str = "", prompt_version: str = "") -> str:
+    """Content address: SHA-256 of the bytes plus everything that shapes the output."""
+    digest = hashlib.sha256()
+    for part in (kind, model, prompt_version):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def prompt_version(prompt: str) -> str:
+    """Short, stable version tag for a prompt text."""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+class ContentCache:
+    """On-disk content-addressable store for extracted text and model outputs.
+
+    Backed by SQLite in WAL mode, so several processes can read and write the
+    same file concurrently. Entries are evicted least-recently-used first once
+    the stored text exceeds ``max_bytes``. Hit and miss counters live in the
+    database too, so they cover every process sharing the cache.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Return the stored value for ``key`` or None, counting the hit or miss.
+
+        Entries written more than ``max_age`` seconds ago are dropped and
+        reported as misses.
+        """
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and max_age is not None and time.time() - row[1] > max_age:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._bump(conn, 'expirations')
+                    row = None
+                if row is None:
+                    self._bump(conn, 'misses')
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._bump(conn, 'hits')
+                return row[0]
+        except sqlite3.Error:
+            # The cache is an optimisation; never fail the caller because of it
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store ``value`` under ``key`` and evict old entries if over budget."""
+        if not value:
+            return
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self._bump(conn, 'evictions', len(stale))
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, expiry and eviction counters plus current entry count and size."""
+        stats = {'hits': 0, 'misses': 0, 'expirations': 0, 'evictions': 0, 'entries': 0, 'bytes': 0}
+        try:
+            with self._connect() as conn:
+                for name, value in conn.execute("SELECT name, value FROM counters"):
+                    stats[name] = value
+                entries, total = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                stats['entries'] = entries
+                stats['bytes'] = total
+        except sqlite3.Error:
+            pass
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_content_cache() -> ContentCache:
+    """Process-wide cache instance, created on first use."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ContentCache()
+    return _default_cache
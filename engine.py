@@ -0,0 +1,1499 @@
+from __future__ import annotations
+
+import io
+import os
+import re
+import json
+import time
+import base64
+import string
+import hashlib
+import logging
+import functools
+import importlib
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field, replace
+from html import escape
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import markdown_ast as md
+from content_cache import get_content_cache, make_cache_key, prompt_version
+from resilience import call_with_retry, create_chat_completion
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from PIL import Image as PILImage
+
+# The document pipeline (extraction, summarization, analysis and report
+# rendering) without any UI. Everything takes an explicit client, config and
+# notify callback, so the app, the batch command and benchmarks share it.
+#
+# Importing this module stays cheap: openai, tiktoken, PyPDF2, PIL and
+# ReportLab are loaded by the functions that need them, or ahead of time by
+# start_prewarm once the first page is on screen.
+
+logger = logging.getLogger(__name__)
+
+# Engine functions report progress and problems through notify(level, message)
+# instead of drawing them; level is 'info', 'warning' or 'error'
+Notify = Callable[[str, str], Any]
+
+def log_notice(level: str, message: str) -> None:
+    """Default notify: engine messages go to the log."""
+    logger.log(logging.getLevelName(level.upper()), message)
+
+# Upper bound on simultaneous vision requests for one upload batch
+MAX_VISION_WORKERS = 4
+VISION_MODEL = "gpt-4o-mini"
+# Summarization of long inputs
+SUMMARY_MODEL = "gpt-4"
+SUMMARY_TOKEN_LIMIT = 6000
+MAX_SUMMARY_WORKERS = 4
+# Upload limits, enforced from the PDF preflight before any text is extracted
+MAX_PDF_PAGES = 500
+MAX_PDF_INPUT_TOKENS = 300000
+ANALYSIS_MODEL = "gpt-4"
+# Total time allowed for one analysis, retries included; long reports take minutes
+ANALYSIS_DEADLINE = 600.0
+# The analysis model's context window holds the prompts, the input, earlier
+# findings and the analysis itself; this many tokens are kept for the analysis
+ANALYSIS_CONTEXT_TOKENS = 8192
+ANALYSIS_OUTPUT_TOKENS = 2000
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Models and limits for a pipeline run; the defaults are the app's settings."""
+    vision_model: str = VISION_MODEL
+    summary_model: str = SUMMARY_MODEL
+    analysis_model: str = ANALYSIS_MODEL
+    max_vision_workers: int = MAX_VISION_WORKERS
+    max_summary_workers: int = MAX_SUMMARY_WORKERS
+    summary_token_limit: int = SUMMARY_TOKEN_LIMIT
+    max_pdf_pages: int = MAX_PDF_PAGES
+    max_pdf_input_tokens: int = MAX_PDF_INPUT_TOKENS
+    analysis_deadline: float = ANALYSIS_DEADLINE
+    analysis_context_tokens: int = ANALYSIS_CONTEXT_TOKENS
+    analysis_output_tokens: int = ANALYSIS_OUTPUT_TOKENS
+
+DEFAULT_CONFIG = EngineConfig()
+
+# Vision provider limits: "high" detail fits the image in 2048x2048 and then
+# scales the short side down to 768px; "low" detail always sees a 512px image
+VISION_MAX_SIDE = 2048
+VISION_MAX_SHORT_SIDE = 768
+VISION_LOW_DETAIL_SIDE = 512
+# Share of edge pixels below which an image is treated as having no text at
+# all (flat graphics, gradients); a single line of handwriting is about 0.004
+VISION_FLAT_IMAGE_THRESHOLD = 0.002
+# EXIF orientation tag; 1 means the pixels are stored upright
+EXIF_ORIENTATION = 0x0112
+VISION_JPEG_QUALITY = 85
+
+def estimate_text_density(image: PILImage.Image) -> float:
+    """Estimate how much fine detail (text, tables, chart labels) an image holds.
+
+    Returns the share of strong edge pixels on a small grayscale thumbnail.
+    """
+    from PIL import ImageFilter
+
+    thumb = image.convert('L')
+    thumb.thumbnail((256, 256))
+    edges = thumb.filter(ImageFilter.FIND_EDGES)
+    # The filter marks the thumbnail's own border as an edge
+    edges = edges.crop((1, 1, edges.width - 1, edges.height - 1))
+    histogram = edges.histogram()
+    strong_edges = sum(histogram[64:])
+    return strong_edges / max(1, sum(histogram))
+
+def prepare_image_for_vision(image_bytes: bytes, output_format: str = 'JPEG') -> Tuple[str, str, str]:
+    """Downscale and re-encode an image before sending it to the vision model.
+
+    Returns (base64 data, MIME type, detail level). Pixels beyond the provider's
+    tile limits are discarded by the provider anyway, so they are dropped here
+    before upload. Images go out at "high" detail unless they already fit the
+    "low" detail size or clearly hold no text, so sparse handwriting and
+    whiteboard photos stay readable.
+    """
+    from PIL import Image as PILImage, ImageOps
+
+    try:
+        image = PILImage.open(io.BytesIO(image_bytes))
+        original_format = image.format
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+        image = ImageOps.exif_transpose(image)
+
+        width, height = image.size
+        if max(width, height) <= VISION_LOW_DETAIL_SIDE:
+            detail = 'low'
+        elif estimate_text_density(image) < VISION_FLAT_IMAGE_THRESHOLD:
+            detail = 'low'
+        else:
+            detail = 'high'
+
+        if detail == 'high':
+            scale = min(1.0, VISION_MAX_SIDE / max(width, height), VISION_MAX_SHORT_SIDE / min(width, height))
+        else:
+            scale = min(1.0, VISION_LOW_DETAIL_SIDE / max(width, height))
+
+        if scale >= 1.0 and not rotated and original_format in ('JPEG', 'PNG', 'WEBP'):
+            # Already upright and within limits in a format the provider accepts
+            mime_type = f"image/{original_format.lower()}"
+            return base64.b64encode(image_bytes).decode('utf-8'), mime_type, detail
+
+        if scale < 1.0:
+            new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image = image.resize(new_size, PILImage.LANCZOS)
+
+        # Flatten transparency onto white; neither target format needs alpha for analysis
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = PILImage.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=output_format, quality=VISION_JPEG_QUALITY, optimize=True)
+        mime_type = f"image/{output_format.lower()}"
+        return base64.b64encode(buffer.getvalue()).decode('utf-8'), mime_type, detail
+    except Exception:
+        # Fall back to sending the upload untouched
+        return base64.b64encode(image_bytes).decode('utf-8'), 'image/jpeg', 'high'
+
+def describe_image(image_bytes: bytes, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG) -> str:
+    """Get a board-focused description of one image using GPT-4 Vision.
+
+    The prompt doesn't mention the image's position in the upload, so the same
+    chart is a cache hit wherever it appears; callers add the "Image N" label.
+    """
+    prompt = "Describe this image in detail, focusing on key business and strategic aspects. Include all relevant details, numbers, and observations that could be important for board-level analysis. If financial data exists, please include time references and periods of which they incur as part of the analysis"
+
+    # Reuse a description any session has already paid for
+    cache = get_content_cache()
+    cache_key = make_cache_key(image_bytes, 'vision', config.vision_model, prompt_version(prompt))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    image_base64, mime_type, detail = prepare_image_for_vision(image_bytes)
+    response = create_chat_completion(
+        client,
+        model=config.vision_model,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{image_base64}",
+                            "detail": detail
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=4096
+    )
+    description = response.choices[0].message.content
+    cache.put(cache_key, description)
+    return description
+
+def process_multiple_images(image_files, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                            notify: Notify = log_notice) -> str:
+    """Process multiple image inputs concurrently and combine their descriptions for analysis."""
+    try:
+        # Read all images up front; worker threads must not touch the uploaded file objects
+        images = []
+        for image_file in image_files:
+            images.append(image_file.read())
+            # Reset file pointer for future use
+            image_file.seek(0)
+        if not images:
+            return ""
+
+        # Describe images in parallel, keeping each result in its upload slot
+        combined_description = [None] * len(images)
+        with ThreadPoolExecutor(max_workers=max(1, min(config.max_vision_workers, len(images)))) as executor:
+            futures = {
+                executor.submit(describe_image, image_bytes, client, config): idx
+                for idx, image_bytes in enumerate(images, 1)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    description = future.result()
+                    combined_description[idx - 1] = f"Image {idx} Analysis:\n{description}\n"
+                except Exception as e:
+                    # Report the failed image and keep the rest of the batch
+                    notify('error', f"Error processing image {idx} ({image_files[idx - 1].name}): {str(e)}")
+
+        # Combine all descriptions with clear separation, in upload order
+        return "\n\n".join(d for d in combined_description if d)
+    except Exception as e:
+        notify('error', f"Error processing images: {str(e)}")
+        return ""
+
+def process_input_content(input_type: str, uploaded_files, text_input: str, client: OpenAI,
+                          config: EngineConfig = DEFAULT_CONFIG, notify: Notify = log_notice) -> str:
+    """Process any type of input and return text content for analysis."""
+    try:
+        if input_type == "PDF Document" and uploaded_files:
+            pages = read_pdf_pages_cached(uploaded_files, config, notify)
+            return remember_pages(pages) if pages else ""
+        elif input_type == "Images" and uploaded_files:  # Note the plural "Images"
+            try:
+                # Process all images together
+                return process_multiple_images(uploaded_files, client, config, notify)
+            except Exception as e:
+                notify('error', f"Error processing images: {str(e)}")
+                return ""
+        elif input_type == "Text Input" and text_input:
+            return text_input
+        return ""
+    except Exception as e:
+        notify('error', f"Error processing input: {str(e)}")
+        return ""
+
+def process_image_input(image_file, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                        notify: Notify = log_notice) -> str:
+    """Process image input and convert to text description for analysis."""
+    try:
+        # Read and encode image
+        image_bytes = image_file.read()
+        image_base64, mime_type, detail = prepare_image_for_vision(image_bytes)
+        
+        # Get image description using GPT-4 Vision
+        response = create_chat_completion(
+            client,
+            model=config.vision_model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Describe this image in detail, focusing on key business and strategic aspects. Include all relevant details, numbers, and observations that could be important for board-level analysis.if financial data exists, please include time references and periods of which they incur as part of the analysis"
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{image_base64}",
+                                "detail": detail
+                            }
+                        }
+                    ]
+                }
+            ],
+            max_tokens=4096
+        )
+        
+        # Reset file pointer for future use
+        image_file.seek(0)
+        return response.choices[0].message.content
+    except Exception as e:
+        notify('error', f"Error processing image: {str(e)}")
+        return ""
+
+
+REPORT_TITLES = {
+    'whats_happening': 'Preliminary Financial & Business Insights',
+    'what_could_happen': 'Scenario Insight Summary',
+    'why_this_happens': 'Possible Causes',
+    'what_should_board_consider': 'Strategic Implications & Board Recommendations',
+    # Include variations without underscores and with spaces
+    'whats happening': 'Preliminary Financial & Business Insights',
+    'what could happen': 'Scenario Insight Summary',
+    'why this happens': 'Possible Causes',
+    'what should board consider': 'Strategic Implications & Board Recommendations',
+    # Include variations without spaces
+    'whatshappening': 'Preliminary Financial & Business Insights',
+    'whatcouldhappen': 'Scenario Insight Summary',
+    'whythishappens': 'Possible Causes',
+    'whatshouldboardconsider': 'Strategic Implications & Board Recommendations'
+}
+
+def render_result_pdf(result: Dict[str, Any], notify: Notify = log_notice) -> bytes:
+    """PDF bytes for a stored result: a single report or a whole board pack."""
+    import report_pdf
+
+    if result['analysis_type'] == 'board_pack':
+        return report_pdf.create_board_pack_pdf(result, notify)
+    return report_pdf.create_styled_pdf_report(result, result['analysis_type'], notify)
+
+# Laying out a report is pure-Python CPU work that more threads would not speed
+# up under the GIL, so one thread renders off the script thread and the page's
+# reruns only ever compete with a single render
+_render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-render')
+MAX_RENDERED_REPORTS = 16
+_rendered_reports = OrderedDict()
+_rendered_reports_lock = threading.Lock()
+
+def result_hash(result: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(result, sort_keys=True).encode('utf-8')).hexdigest()
+
+def start_pdf_render(result: Dict[str, Any]) -> Future:
+    """Render a result's PDF in the background, once per distinct result.
+
+    Streamlit reruns the script on every widget interaction; the returned
+    job is shared by all of them, so the report is laid out only once.
+    """
+    key = result_hash(result)
+    with _rendered_reports_lock:
+        job = _rendered_reports.get(key)
+        if job is None:
+            job = _render_pool.submit(render_result_pdf, result)
+            _rendered_reports[key] = job
+            while len(_rendered_reports) > MAX_RENDERED_REPORTS:
+                _rendered_reports.popitem(last=False)
+        _rendered_reports.move_to_end(key)
+    return job
+
+def finished_pdf(result: Dict[str, Any], job: Future) -> Optional[bytes]:
+    """PDF bytes of a finished render job, or None if it failed.
+
+    A failed render is dropped from the cache, so the next request for the
+    result lays it out again instead of reusing the failure.
+    """
+    error = job.exception()
+    if error is None and job.result():
+        return job.result()
+    if error is not None:
+        logger.warning(f"Could not render the PDF report: {str(error)}")
+    with _rendered_reports_lock:
+        key = result_hash(result)
+        if _rendered_reports.get(key) is job:
+            del _rendered_reports[key]
+    return None
+
+# Joined words split for display: camelCase, letters into a whole number
+# ("FY2024") and a whole number into letters ("2024Q", "5million"). Decimals
+# stay attached ("3.5x") except before "million". Numbers are matched whole,
+# so digits inside a decimal never count as a boundary.
+SPLIT_WORDS = re.compile(r"""
+    (?<=[a-z])(?=[A-Z])
+  | (?<=[A-Za-z])(?=[0-9]+(?![0-9]|\.[0-9]))
+  | (?<=[0-9]\.)(?=million)
+  | (?P<number>[0-9]+(?:\.[0-9]+)?)
+""", re.VERBOSE)
+
+def _split_word_gap(match: re.Match) -> str:
+    number = match.group('number')
+    if number is None:
+        return ' '
+    following = match.string[match.end():match.end() + 7]
+    if following and following[0] in string.ascii_letters and ('.' not in number or following.startswith('million')):
+        return number + ' '
+    return number
+
+def split_words(text: str) -> str:
+    """Split joined words in one line of display text"""
+    return SPLIT_WORDS.sub(_split_word_gap, text)
+
+def inline_html(content: md.Inline, split: bool = True) -> str:
+    """Display HTML for a run of spans, splitting joined words unless ``split`` is off"""
+    parts = []
+    for span in content:
+        text = escape(split_words(span.text) if split else span.text, quote=False)
+        if span.bold:
+            text = f"<strong>{text}</strong>"
+        if span.italic:
+            text = f"<em>{text}</em>"
+        parts.append(text)
+    return "".join(parts)
+
+def markdown_blocks_html(blocks: Tuple[md.Block, ...]) -> str:
+    """Display HTML for parsed analysis markdown; table cells are shown as written.
+
+    Emitted without blank lines, so Streamlit's markdown keeps it as one HTML block.
+    """
+    parts = []
+    for block in blocks:
+        if isinstance(block, md.Heading):
+            level = min(block.level, 3)
+            parts.append(f"<h{level}>{inline_html(block.content)}</h{level}>")
+        elif isinstance(block, md.Table):
+            header = "".join(f"<th>{inline_html(cell, split=False)}</th>" for cell in block.header)
+            rows = "".join(
+                "<tr>" + "".join(f"<td>{inline_html(cell, split=False)}</td>" for cell in row) + "</tr>"
+                for row in block.rows
+            )
+            parts.append(f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>")
+        elif isinstance(block, md.ListBlock):
+            tag = "ol" if block.ordered else "ul"
+            items = "".join(f"<li>{inline_html(item)}</li>" for item in block.items)
+            parts.append(f"<{tag}>{items}</{tag}>")
+        else:
+            parts.append(f"<p>{inline_html(block.content)}</p>")
+    return "".join(parts)
+
+def render_analysis_html(result: Dict[str, Any]) -> str:
+    """Build the A4-styled HTML for one analysis result, once per distinct result"""
+    return _render_analysis_html(result['analysis_type'], result.get('timestamp', 'N/A'), result['analysis'])
+
+@functools.lru_cache(maxsize=64)
+def _render_analysis_html(analysis_type: str, timestamp: str, analysis: str) -> str:
+    # Same parse as the PDF report, so both show the same structure
+    analysis_content = markdown_blocks_html(md.parse_markdown(analysis))
+    
+    # Get the appropriate title for the analysis type
+    analysis_title = REPORT_TITLES.get(analysis_type, 'Analysis Report')
+    
+    return f"""
+        <div class="analysis-result">
+            <div class="result-header">{analysis_title}</div>
+            <div class="result-metadata">Generated on: {timestamp}</div>
+            <div class="result-content">{analysis_content}</div>
+        </div>
+    """
+
+
+# Pages of a document are joined with a blank line, which chunking treats as a boundary
+PAGE_SEPARATOR = "\n\n"
+
+@functools.lru_cache(maxsize=None)
+def get_encoding():
+    """Process-wide tokenizer shared by counting, chunking and budgeting."""
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+@dataclass
+class TokenizedDocument:
+    """Text together with its token array and the token offset of each page.
+
+    Built once per document so that counting, chunking and budgeting all reuse
+    the same encoding instead of tokenizing the text again. Tokens are kept as
+    a compact ``array('I')`` rather than a list of Python ints.
+    """
+    text: str
+    tokens: Sequence[int]
+    page_offsets: List[int] = field(default_factory=lambda: [0])
+
+    @classmethod
+    def from_text(cls, text: str) -> 'TokenizedDocument':
+        return cls(text=text, tokens=array('I', get_encoding().encode(text)))
+
+    @classmethod
+    def from_pages(cls, pages: List[str]) -> 'TokenizedDocument':
+        """Tokenize page by page, recording where each page starts in the token array."""
+        encoding = get_encoding()
+        separator_tokens = encoding.encode(PAGE_SEPARATOR)
+        tokens, page_offsets = array('I'), []
+        for i, page in enumerate(pages):
+            if i:
+                tokens.extend(separator_tokens)
+            page_offsets.append(len(tokens))
+            tokens.extend(encoding.encode(page))
+        return cls(text=PAGE_SEPARATOR.join(pages), tokens=tokens, page_offsets=page_offsets or [0])
+
+    @property
+    def token_count(self) -> int:
+        return len(self.tokens)
+
+    def chunks(self, max_chunk_tokens: int = 6000, overlap_tokens: int = 0) -> List[str]:
+        if self.token_count <= max_chunk_tokens:
+            return [self.text] if self.tokens else []
+        return chunk_tokens(self.tokens, max_chunk_tokens, overlap_tokens, self.page_offsets)
+
+# Recently tokenized documents, and the page lengths of recently ingested PDFs
+# so the tokenizer can record where each page starts, both by content hash
+MAX_TOKENIZED_DOCUMENTS = 16
+_tokenized_documents = OrderedDict()
+_document_pages = OrderedDict()
+_tokenized_documents_lock = threading.Lock()
+
+def document_hash(text: str) -> str:
+    return make_cache_key(text.encode('utf-8'), 'document')
+
+def _remember(cache: OrderedDict, key: str, value) -> None:
+    with _tokenized_documents_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > MAX_TOKENIZED_DOCUMENTS:
+            cache.popitem(last=False)
+
+def remember_pages(pages: List[str]) -> str:
+    """Join a document's pages into the text to analyse, keeping the page lengths for tokenizing."""
+    text = PAGE_SEPARATOR.join(pages)
+    _remember(_document_pages, document_hash(text), [len(page) for page in pages])
+    return text
+
+def get_tokenized_document(text: str) -> TokenizedDocument:
+    """Tokenize a document once per process; later calls with the same text reuse it.
+
+    Meant for whole documents and their summaries; short one-off texts such as
+    findings use ``TokenizedDocument.from_text`` and are not cached. Text that
+    came from remember_pages is tokenized page by page, so chunking can cut at
+    page starts.
+    """
+    key = document_hash(text)
+    with _tokenized_documents_lock:
+        document = _tokenized_documents.get(key)
+        if document is not None:
+            _tokenized_documents.move_to_end(key)
+            return document
+        page_lengths = _document_pages.get(key)
+    if page_lengths is None:
+        document = TokenizedDocument.from_text(text)
+    else:
+        pages, start = [], 0
+        for length in page_lengths:
+            pages.append(text[start:start + length])
+            start += length + len(PAGE_SEPARATOR)
+        document = TokenizedDocument.from_pages(pages)
+    _remember(_tokenized_documents, key, document)
+    return document
+
+# Don't snap a cut point back further than this share of a chunk
+CHUNK_MIN_FILL = 0.5
+# Cut-point separators, strongest first: page break or blank line, line break
+# (keeps markdown table rows whole), then end of sentence
+CHUNK_BOUNDARIES = [(b'\f', b'\n\n'), (b'\n',), (b'. ', b'? ', b'! ')]
+
+def snap_chunk_end(encoding, tokens: Sequence[int], lo: int, hi: int) -> int:
+    """Return the token index in (lo, hi] just after the strongest boundary, or hi.
+
+    The window is decoded once and searched with ``rfind``; the byte offset is
+    then mapped back to a token index by walking back from the end of the
+    window, which is short because the last boundary is usually close to it.
+    """
+    window = encoding.decode_bytes(list(tokens[lo:hi]))
+    for separators in CHUNK_BOUNDARIES:
+        target = max(window.rfind(sep) + len(sep) if sep in window else -1 for sep in separators)
+        if target <= 0:
+            continue
+        # Drop whole tokens from the end while they lie entirely after the separator
+        end, remaining = hi, len(window) - target
+        while end > lo + 1:
+            size = len(encoding.decode_single_token_bytes(tokens[end - 1]))
+            if size > remaining:
+                break
+            remaining -= size
+            end -= 1
+        return end
+    return hi
+
+def snap_chunk_start(encoding, tokens: Sequence[int], lo: int, hi: int) -> int:
+    """Return the token index in [lo, hi) just after the earliest strongest boundary, or lo.
+
+    The counterpart of snap_chunk_end for text that is cut from the front.
+    """
+    window = encoding.decode_bytes(list(tokens[lo:hi]))
+    for separators in CHUNK_BOUNDARIES:
+        found = [window.find(sep) + len(sep) for sep in separators if sep in window]
+        if not found:
+            continue
+        # Skip whole tokens while they lie entirely before the end of the separator
+        start, remaining = lo, min(found)
+        while start < hi - 1:
+            size = len(encoding.decode_single_token_bytes(tokens[start]))
+            if size > remaining:
+                break
+            remaining -= size
+            start += 1
+        return start
+    return lo
+
+def chunk_tokens(tokens: Sequence[int], max_chunk_tokens: int = 6000, overlap_tokens: int = 0,
+                 page_offsets: Sequence[int] = ()) -> List[str]:
+    """Split an already-encoded token array into decoded text chunks.
+
+    The token array is sliced directly, and each cut is snapped back to the
+    last page start from ``page_offsets`` in the second half of the chunk, or
+    failing that to the nearest paragraph, line or sentence boundary there.
+    ``overlap_tokens`` repeats the tail of each chunk at the start of the next.
+    """
+    encoding = get_encoding()
+    overlap_tokens = max(0, min(overlap_tokens, max_chunk_tokens // 2))
+    min_fill = max(1, int(max_chunk_tokens * CHUNK_MIN_FILL))
+
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = start + max_chunk_tokens
+        if end >= len(tokens):
+            end = len(tokens)
+        else:
+            page = bisect_right(page_offsets, end) - 1
+            if page >= 0 and page_offsets[page] > start + min_fill:
+                end = page_offsets[page]
+            else:
+                end = snap_chunk_end(encoding, tokens, start + min_fill, end)
+        chunks.append(encoding.decode(list(tokens[start:end])))
+        if end >= len(tokens):
+            break
+        start = max(end - overlap_tokens, start + 1)
+
+    return chunks
+
+# Summarization settings for long inputs
+SUMMARY_SYSTEM_PROMPT = "Summarize the following text while preserving key facts, figures, and insights:For each point and section, make sure you provide in depth statistics, supporting facts, figures to support each assertion, as well as quoting the sources from where the data is obtained. From the data provided, contextualise and synthesize with the analysis."
+SUMMARY_FAN_IN = 4
+SUMMARY_MAX_DEPTH = 3
+SUMMARY_CHUNK_RETRIES = 3
+
+def summarize_chunk(chunk: str, client: OpenAI, retries: int = SUMMARY_CHUNK_RETRIES,
+                    config: EngineConfig = DEFAULT_CONFIG) -> str:
+    """Summarize one chunk, retrying transient failures before giving up."""
+    response = create_chat_completion(
+        client,
+        model=config.summary_model,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": chunk}
+        ],
+        max_tokens=1000,
+        max_attempts=retries + 1
+    )
+    return response.choices[0].message.content
+
+def summarize_in_parallel(texts: List[str], client: OpenAI, label: str,
+                          config: EngineConfig = DEFAULT_CONFIG, notify: Notify = log_notice) -> List[str]:
+    """Summarize texts concurrently, returning summaries in input order.
+
+    Texts that still fail after retries are reported and left out.
+    """
+    summaries = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max(1, min(config.max_summary_workers, len(texts)))) as executor:
+        futures = {executor.submit(summarize_chunk, text, client, config=config): i for i, text in enumerate(texts)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                summaries[i] = future.result()
+            except Exception as e:
+                notify('warning', f"Could not summarize {label} {i+1} of {len(texts)}; it is left out of the summary: {str(e)}")
+    return [summary for summary in summaries if summary]
+
+def summarize_chunks(chunks: List[str], client: OpenAI, fan_in: int = SUMMARY_FAN_IN,
+                     max_depth: int = SUMMARY_MAX_DEPTH, config: EngineConfig = DEFAULT_CONFIG,
+                     notify: Notify = log_notice) -> Tuple[str, bool]:
+    """Summarize multiple chunks of text into a condensed version.
+
+    Map step: every chunk is summarized in parallel. Reduce step: while the
+    joined summaries exceed the token limit, they are combined in groups of
+    ``fan_in`` and summarized again, at most ``max_depth`` passes deep.
+    Progress and warnings are reported through ``notify``. Returns the
+    summary and whether every chunk and group made it into it.
+    """
+    if not chunks:
+        return "", True
+
+    notify('info', f"Summarizing {len(chunks)} chunks...")
+    summaries = summarize_in_parallel(chunks, client, "chunk", config, notify)
+    complete = len(summaries) == len(chunks)
+
+    depth = 0
+    summary_doc = TokenizedDocument.from_text(" ".join(summaries))
+    while summaries and summary_doc.token_count > config.summary_token_limit:
+        if depth >= max_depth:
+            notify('warning', "Summary is still too long after the maximum number of passes; truncating it.")
+            return summary_doc.chunks(config.summary_token_limit)[0], complete
+        depth += 1
+        groups = [" ".join(summaries[i:i + fan_in]) for i in range(0, len(summaries), fan_in)]
+        notify('info', f"Combining {len(summaries)} summaries into {len(groups)} (pass {depth})...")
+        summaries = summarize_in_parallel(groups, client, "summary group", config, notify)
+        complete = complete and len(summaries) == len(groups)
+        summary_doc = TokenizedDocument.from_text(" ".join(summaries))
+
+    return summary_doc.text, complete
+
+def summary_cache_key(text: str, config: EngineConfig = DEFAULT_CONFIG) -> str:
+    return make_cache_key(text.encode('utf-8'), 'summary', config.summary_model,
+                          prompt_version(f"{SUMMARY_SYSTEM_PROMPT}\0{config.summary_token_limit}"))
+
+def condense_document(text: str, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                      notify: Notify = log_notice) -> Tuple[str, bool]:
+    """Condensed form of a document for the analysis prompts, and whether it is complete.
+
+    Short documents pass through unchanged. Long ones are summarized once and
+    the summary is kept in the content cache, so every analysis type, and
+    every session viewing the same document, reuses it. A summary that is
+    missing chunks is returned but not cached, so the next request tries
+    again; one with nothing in it raises.
+    """
+    document = get_tokenized_document(text)
+    if document.token_count <= config.summary_token_limit:
+        return text, True
+    cache = get_content_cache()
+    cache_key = summary_cache_key(text, config)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+    summary, complete = summarize_chunks(document.chunks(), client, config=config, notify=notify)
+    if not summary.strip():
+        raise RuntimeError("None of the document could be summarized for analysis; please try again.")
+    if complete:
+        cache.put(cache_key, summary)
+    return summary, complete
+
+# Summaries being written or finished, by summary cache key. Finished jobs are
+# kept so their warnings can still be reported when an analysis picks them up
+MAX_SUMMARY_JOBS = 32
+_summary_jobs = OrderedDict()
+_summary_jobs_lock = threading.Lock()
+
+def condense_document_quietly(text: str, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                              progress: Optional[Notify] = None) -> Tuple[str, bool, List[str]]:
+    """condense_document for shared jobs: warnings are collected for whoever waits on it.
+
+    Progress messages go to ``progress``, if given, and are dropped otherwise.
+    """
+    warnings = []
+
+    def collect(level, message):
+        if level != 'info':
+            warnings.append(message)
+        elif progress:
+            progress(level, message)
+
+    summary, complete = condense_document(text, client, config, notify=collect)
+    return summary, complete, warnings
+
+def summary_job_complete(job: Future) -> bool:
+    """Whether a finished summary job succeeded with every chunk in it."""
+    return job.exception() is None and job.result()[1]
+
+def condense_document_once(text: str, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                           progress: Optional[Notify] = None) -> Future:
+    """Condense a document on the calling thread, once per document.
+
+    A caller that finds the document already being summarized, for example
+    by the summary job started at ingestion, gets that job's future to wait
+    on instead of starting another. Jobs that fail or come back missing
+    chunks are dropped once they finish, so the next request summarizes the
+    document again.
+    """
+    cache_key = summary_cache_key(text, config)
+    with _summary_jobs_lock:
+        job = _summary_jobs.get(cache_key)
+        started = job is None or (job.done() and not summary_job_complete(job))
+        if started:
+            job = Future()
+            job.set_running_or_notify_cancel()
+            _summary_jobs[cache_key] = job
+            while len(_summary_jobs) > MAX_SUMMARY_JOBS:
+                _summary_jobs.popitem(last=False)
+        _summary_jobs.move_to_end(cache_key)
+    if started:
+        job.add_done_callback(functools.partial(_forget_incomplete_summary, cache_key))
+        try:
+            job.set_result(condense_document_quietly(text, client, config, progress))
+        except BaseException as e:
+            job.set_exception(e)
+    return job
+
+def _forget_incomplete_summary(cache_key: str, job: Future) -> None:
+    if summary_job_complete(job):
+        return
+    with _summary_jobs_lock:
+        if _summary_jobs.get(cache_key) is job:
+            del _summary_jobs[cache_key]
+
+def read_pdf_pages(pdf_file, notify: Notify = log_notice) -> Optional[List[str]]:
+    """Read and extract text from PDF file, one string per page"""
+    from pdf_extract import extract_pdf_pages
+
+    try:
+        pdf_bytes = pdf_file.getvalue() if hasattr(pdf_file, 'getvalue') else pdf_file.read()
+        return extract_pdf_pages(pdf_bytes)
+    except Exception as e:
+        notify('error', f"Error reading PDF: {str(e)}")
+        return None
+
+def read_pdf(pdf_file, notify: Notify = log_notice):
+    """Read and extract text from PDF file"""
+    pages = read_pdf_pages(pdf_file, notify)
+    if pages is None:
+        return None
+    return PAGE_SEPARATOR.join(pages)
+
+def read_pdf_pages_cached(pdf_file, config: EngineConfig = DEFAULT_CONFIG,
+                          notify: Notify = log_notice) -> Optional[List[str]]:
+    """Read PDF pages through the shared content cache, so a document any session
+    has already processed is not parsed again.
+
+    A cheap preflight runs first: unreadable documents are rejected, scanned
+    pages are reported, and oversized documents are truncated to the leading
+    pages that fit the upload limits, so only those pages are extracted.
+    """
+    import PyPDF2
+    from pdf_extract import LazyPdf
+
+    pdf_bytes = pdf_file.getvalue()
+    cache = get_content_cache()
+    cache_key = make_cache_key(pdf_bytes, 'pdf_pages', f"PyPDF2-{PyPDF2.__version__}",
+                               f"limits:{config.max_pdf_pages}:{config.max_pdf_input_tokens}")
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    try:
+        pdf = LazyPdf(pdf_bytes)
+        preflight = pdf.preflight()
+        if not preflight.readable:
+            notify('error', "This PDF is password-protected and cannot be read.")
+            return None
+        if preflight.page_count == 0:
+            notify('error', "This PDF has no pages.")
+            return None
+
+        missing_text = preflight.pages_without_text
+        if missing_text:
+            notify('warning', f"{len(missing_text)} of {preflight.page_count} pages have no text layer "
+                       "(likely scanned images) and will add no text to the analysis.")
+
+        stop = preflight.pages_within_budget(config.max_pdf_input_tokens, config.max_pdf_pages)
+        if stop < preflight.page_count:
+            notify('warning', f"This document is very large ({preflight.page_count} pages, about "
+                       f"{preflight.estimated_tokens:,} tokens). Only the first {stop} pages will be analysed.")
+
+        pages = pdf.extract_pages(0, stop)
+    except Exception as e:
+        notify('error', f"Error reading PDF: {str(e)}")
+        return None
+
+    if any(page.strip() for page in pages):
+        cache.put(cache_key, json.dumps(pages))
+    return pages
+
+def create_professional_system_prompt() -> str:
+    """Creates a standardized system prompt for consistent professional formatting."""
+    return (
+        "You are a seasoned board advisor providing comprehensive strategic analysis. Explain and expressed from the perspective of board directors "
+        "Follow these strict formatting rules: "
+        "1. Use markdown bold for all section headers and key findings\n"
+        "2. Numbers and Currency: "
+        "   Write all currency values consistently, such as 'USD 75 million' or '$75 million'. "
+        "   Always use spaces between numbers and units (e.g., '75 million'). "
+        "   Present all numbers as numerals with proper formatting (e.g., '289 million'). "
+        "   CRITICAL: Never join numbers with words (write '55.64 million' NOT '55.64million')\n"
+        "3. Text Formatting: "
+        "   Use standard paragraph formatting with clear spacing. "
+        "   Avoid italics, special characters, or unusual formatting. "
+        "   No ### at the start of the header or subheader"
+        "   No special characters or fancy formatting. "
+        "   Maintain consistent font and style throughout. "
+        "   CRITICAL: Never join words together - always use spaces between words.\n"
+        "   Examples of correct formatting:"
+        "   - 'targets city development' NOT 'targetscitydevelopment'"
+        "   - 'credit loan for a regional bank' NOT 'creditloanforaregionalbank'"
+        "   - 'from BADEA's loan' NOT 'fromBADEA'sloan'\n"
+        "4. Section Headers: "
+        "   Use bold markdown for headers. "
+        "   Keep header formatting consistent throughout the document. "
+        "5. Lists and Tables: "
+        "   Use simple, clean formatting for any lists. "
+        "   Create tables with clear organization and consistent spacing. "
+        "6. Professional Language: "
+        "   Use formal, board-appropriate language. "
+        "   Maintain consistent tone throughout. "
+        "   Present data clearly and professionally."
+        "7. Do not generate footnotes or citations at the bottom of the analysis\n"
+        "8. Reference sources directly within the text when needed\n"
+        "9. Special Formatting Rules:"
+        "   - Always add spaces after numbers (e.g., '40 million' NOT '40million')"
+        "   - Always separate SDG references with spaces (e.g., 'SDG 11' NOT 'SDG11')"
+        "   - Use spaces around parentheses (e.g., ' (SDG 9) ' NOT '(SDG9)')"
+        "   - Never use camelCase or joined words"
+        "   - Always maintain proper word spacing throughout the document\n"
+        "10. Quality Control:"
+        "    - Review output to ensure no words are incorrectly joined"
+        "    - Verify proper spacing between all numbers and words"
+        "    - Ensure consistent formatting throughout the document"
+    )
+# Every cleaning rule decides what belongs in the gap between two characters:
+# nothing, or exactly one space. One pattern finds every gap that needs
+# changing, so each line is cleaned in a single scan. The leading guard lets
+# the common lowercase-to-lowercase gap fail after two cheap checks.
+CLEAN_GAPS = re.compile(r"""
+    (?: (?=[\s(A-Z\d]) | (?<=[.,)\d]) )
+    (?:
+        (?P<drop>
+            (?<=[^\W\d])\s+(?=ing\b)            # split words: "process ing" -> "processing"
+          | (?<![.,])\s+(?=[.,])                # no space before . or ,
+        )
+      | (?P<space>
+            \s{2,} | [^\S ]                     # collapse other whitespace to one space
+          | (?<=[.,])(?=\S)(?!(?<=\d[.,])\d)    # space after . and , but not inside 3.5 or 1,000
+          | (?<=[\w)])(?=\()                    # "word(" -> "word ("
+          | (?<=\))(?=[A-Za-z])                 # ")word" -> ") word"
+          | (?<=[^\s.])(?=[A-Z][a-z])           # "wordWord", "ABCWord" -> "word Word", "ABC Word"
+          | (?<=[^\s.])(?=[A-Z]\s+ing\b)        # same, once "X ing" is joined into "Xing"
+          | (?<=\d)(?=[A-Za-z])                 # "5million" -> "5 million"
+          | (?<=[A-Za-z])(?=\d)                 # "FY2024" -> "FY 2024"
+        )
+    )
+""", re.VERBOSE)
+
+def _clean_gap(match: re.Match) -> str:
+    return '' if match.lastgroup == 'drop' else ' '
+
+def clean_text_anomalies(text: str) -> str:
+    """Clean up text anomalies by adding proper spacing while preserving formatting"""
+    if not text:
+        return text
+    
+    # Process text line by line
+    lines = []
+    for line in text.split('\n'):
+        # Skip lines that appear to be tables
+        if '|' in line or line.strip().startswith('-'):
+            lines.append(line)
+        else:
+            lines.append(CLEAN_GAPS.sub(_clean_gap, line).strip())
+    
+    return '\n'.join(lines)
+
+def prepare_analysis_input(text: str, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                           notify: Notify = log_notice) -> str:
+    """Condense long inputs so they fit the analysis prompt; short inputs pass through.
+
+    The summary is computed once per document and shared by all analysis
+    types; if another job is already writing it, such as the summary job
+    started at ingestion, this waits for it. Inputs are summarized once they exceed analysis_input_config's limit, so
+    they are condensed rather than cut when the prompt is budgeted.
+    Raises instead of returning an empty summary, so no analysis runs on no data.
+    """
+    config = analysis_input_config(config)
+    if get_tokenized_document(text).token_count <= config.summary_token_limit:
+        return text
+    notify('info', "Input text is long, waiting for its automatic summary...")
+    summary, _, warnings = condense_document_once(text, client, config, progress=notify).result()
+    for warning in warnings:
+        notify('warning', warning)
+    if not summary.strip():
+        raise RuntimeError("None of the document could be summarized for analysis; please try again.")
+    return summary
+
+# Earlier findings may take at least this share of the prompt room when they need it
+UPSTREAM_SHARE = 0.4
+# Chat formatting tokens per request, beyond the message texts
+CHAT_OVERHEAD_TOKENS = 16
+
+def fit_to_tokens(document: TokenizedDocument, max_tokens: int) -> str:
+    """The document's text cut back to a paragraph, line or sentence boundary within ``max_tokens``."""
+    if max_tokens <= 0:
+        return ""
+    if document.token_count <= max_tokens:
+        return document.text
+    return document.chunks(max_tokens)[0]
+
+def fit_tail_to_tokens(document: TokenizedDocument, max_tokens: int) -> str:
+    """The end of the document's text within ``max_tokens``, starting after a paragraph, line or sentence boundary."""
+    if max_tokens <= 0:
+        return ""
+    if document.token_count <= max_tokens:
+        return document.text
+    encoding = get_encoding()
+    tokens = document.tokens
+    lo = len(tokens) - max_tokens
+    start = snap_chunk_start(encoding, tokens, lo, len(tokens) - max(1, int(max_tokens * CHUNK_MIN_FILL)))
+    return encoding.decode(list(tokens[start:]))
+
+def analysis_prompt_room(prompt: str, upstream_types: Sequence[str], config: EngineConfig = DEFAULT_CONFIG) -> int:
+    """Context tokens left for the input and finding texts of one analysis.
+
+    Everything else is set aside: the analysis itself, the system and analysis
+    prompts, and the headings and framing around the input and findings.
+    """
+    encoding = get_encoding()
+    framing = analysis_user_content(prompt, "", {t: "" for t in upstream_types})
+    fixed = len(encoding.encode(create_professional_system_prompt())) + len(encoding.encode(framing))
+    return config.analysis_context_tokens - config.analysis_output_tokens - fixed - CHAT_OVERHEAD_TOKENS
+
+@functools.lru_cache(maxsize=None)
+def analysis_input_config(config: EngineConfig = DEFAULT_CONFIG) -> EngineConfig:
+    """``config`` with its summary limit lowered to the input room of the tightest analysis prompt.
+
+    Analyses that build on earlier findings keep UPSTREAM_SHARE of their room
+    for them. One limit for all analyses keeps one summary per document.
+    """
+    limit = config.summary_token_limit
+    for analysis_type, prompt in ANALYSIS_PROMPTS.items():
+        dependencies = ANALYSIS_DEPENDENCIES[analysis_type]
+        room = analysis_prompt_room(prompt(), dependencies, config)
+        if dependencies:
+            room -= int(room * UPSTREAM_SHARE)
+        limit = min(limit, room)
+    return replace(config, summary_token_limit=max(1, limit))
+
+def budget_analysis_input(prompt: str, text: str, upstream: Optional[Dict[str, str]] = None,
+                          config: EngineConfig = DEFAULT_CONFIG,
+                          notify: Notify = log_notice) -> Tuple[str, Dict[str, str]]:
+    """Trim the input and earlier findings so the prompt leaves room for the analysis.
+
+    Findings get whatever the input leaves of the context, and at least
+    UPSTREAM_SHARE of it when they need it. Each finding keeps its end, where
+    its conclusions are, within an equal share, and short ones pass their
+    unused share on. The input is cut only when it doesn't fit next to them,
+    which prepare_analysis_input avoids by summarizing it first; a cut is
+    reported as a warning.
+    """
+    room = analysis_prompt_room(prompt, list(upstream or {}), config)
+    document = get_tokenized_document(text)
+    text_tokens = document.token_count
+    findings = {t: TokenizedDocument.from_text(finding) for t, finding in (upstream or {}).items()}
+    sizes = {t: finding.token_count for t, finding in findings.items()}
+
+    remaining = min(sum(sizes.values()), max(room - text_tokens, int(room * UPSTREAM_SHARE)))
+    shares = {}
+    for left, analysis_type in enumerate(sorted(sizes, key=sizes.get)):
+        shares[analysis_type] = min(sizes[analysis_type], remaining // (len(sizes) - left))
+        remaining -= shares[analysis_type]
+    fitted = {t: fit_tail_to_tokens(finding, shares[t]) for t, finding in findings.items()}
+    if any(shares[t] < sizes[t] for t in sizes):
+        notify('info', "Shortening earlier findings to their closing parts to fit the analysis model's context...")
+
+    text_budget = room - sum(shares.values())
+    if text_tokens > text_budget:
+        notify('warning', f"The input was cut to its first {max(0, text_budget)} of {text_tokens} tokens "
+                          f"to fit the analysis model's context.")
+    return fit_to_tokens(document, text_budget), {t: finding for t, finding in fitted.items() if finding}
+
+def analysis_user_content(prompt: str, text: str, upstream: Optional[Dict[str, str]] = None) -> str:
+    content = prompt + f"\n\nData for analysis: {text}"
+    if upstream:
+        findings = "\n\n".join(f"### {REPORT_TITLES[t]}\n{analysis}" for t, analysis in upstream.items())
+        content += f"\n\nFindings of the earlier analyses of this data, to build on rather than repeat:\n\n{findings}"
+    return content
+
+def build_analysis_messages(prompt: str, text: str, upstream: Optional[Dict[str, str]] = None,
+                            config: EngineConfig = DEFAULT_CONFIG,
+                            notify: Notify = log_notice) -> List[Dict[str, str]]:
+    """Chat messages for one analysis; ``upstream`` holds earlier findings by analysis type.
+
+    Input and findings are budgeted to fit the model's context, see budget_analysis_input.
+    """
+    text, upstream = budget_analysis_input(prompt, text, upstream, config, notify)
+    return [
+        {"role": "system", "content": create_professional_system_prompt()},
+        {"role": "user", "content": analysis_user_content(prompt, text, upstream)}
+    ]
+
+def make_result(analysis_type: str, cleaned_analysis: str) -> Dict[str, Any]:
+    return {
+        "analysis_type": analysis_type,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "analysis": cleaned_analysis
+    }
+
+# Finished analyses are reused for this long; prompt or model changes invalidate them anyway
+ANALYSIS_CACHE_TTL = float(os.environ.get('BADEA_ANALYSIS_CACHE_TTL', 7 * 24 * 3600))
+
+def analysis_cache_key(text: str, analysis_type: str, prompt: str,
+                       upstream: Optional[Dict[str, str]] = None,
+                       config: EngineConfig = DEFAULT_CONFIG) -> str:
+    """Cache key for one analysis of the raw input text.
+
+    Covers the input, analysis type, model, both prompts and the upstream
+    findings it was given, so editing a prompt, switching model or
+    regenerating an earlier analysis never serves a stale report.
+    """
+    parts = [create_professional_system_prompt(), prompt]
+    for upstream_type, analysis in (upstream or {}).items():
+        parts += [upstream_type, analysis]
+    version = prompt_version("\0".join(parts))
+    return make_cache_key(text.encode('utf-8'), f"analysis:{analysis_type}", config.analysis_model, version)
+
+def get_cached_analysis(cache_key: str, analysis_type: str) -> Optional[Dict[str, Any]]:
+    """A cached result with the timestamp it was generated at, so repeat hits are identical."""
+    cached = get_content_cache().get(cache_key, max_age=ANALYSIS_CACHE_TTL)
+    if cached is None:
+        return None
+    try:
+        entry = json.loads(cached)
+    except ValueError:
+        entry = None
+    if not isinstance(entry, dict) or 'analysis' not in entry:
+        # Written before timestamps were stored; treat as a miss so it is regenerated
+        return None
+    return {"analysis_type": analysis_type, "timestamp": entry["timestamp"], "analysis": entry["analysis"]}
+
+def put_cached_analysis(cache_key: str, result: Dict[str, Any]) -> None:
+    entry = {"timestamp": result["timestamp"], "analysis": result["analysis"]}
+    get_content_cache().put(cache_key, json.dumps(entry))
+
+def run_analysis(text: str, analysis_type: str, prompt: str, client: OpenAI,
+                 upstream: Optional[Dict[str, str]] = None,
+                 config: EngineConfig = DEFAULT_CONFIG,
+                 notify: Notify = log_notice) -> Dict[str, Any]:
+    """Run one analysis over already-prepared input.
+
+    Safe to call from worker threads; errors propagate to the caller.
+    """
+    response = create_chat_completion(
+        client,
+        deadline=config.analysis_deadline,
+        model=config.analysis_model,
+        messages=build_analysis_messages(prompt, text, upstream, config, notify)
+    )
+    analysis_text = response.choices[0].message.content
+    try:
+        cleaned_analysis = clean_text_anomalies(analysis_text)
+    except Exception:
+        cleaned_analysis = analysis_text
+    return make_result(analysis_type, cleaned_analysis)
+
+
+def whats_happening_prompt() -> str:
+    """Prompt for the current trends analysis."""
+    return (
+        "You are a globally recognized financial consultant, sought after for your expertise in providing in-depth, actionable, and strategic financial analyses tailored to senior executives and stakeholders. Leveraging your extensive experience and the data provided, perform a *comprehensive financial health evaluation and advisory* for the company in question. Your analysis must incorporate advanced financial modeling, credit rating assessments comparable to S&P and Moody's methodologies, and an evaluation of working capital needs and debt repayment capacity. Focus on delivering insights that drive informed, strategic decision-making.\n\n"
+        "1. Financial Health Analysis with Credit Rating. 900 words.\n"
+        "Evaluate the company’s financial health using key financial metrics, such as:\n"
+        "   - Liquidity Ratios (Current Ratio, Quick Ratio)\n"
+        "   - Profitability Ratios (Net Profit Margin, ROE, ROA)\n"
+        "   - Solvency Ratios (Debt-to-Equity, Interest Coverage Ratio)\n"
+        "   - Efficiency Ratios (Receivables Turnover, Inventory Turnover)\n"
+        "Develop a credit rating assessment similar to S&P and Moody's by analyzing:\n"
+        "   - Business risk: Industry outlook, market positioning, revenue diversification, and operational efficiency.\n"
+        "   - Financial risk: Leverage, profitability trends, liquidity, and cash flow adequacy.\n"
+        "   - Assign an estimated credit rating (e.g., BBB, A, AA) with supporting rationale tied to these factors.\n"
+        "Provide insights into the company’s capacity to meet its financial obligations, particularly focusing on its ability to maintain a favorable rating amid external and internal risks.\n"
+        "2. Working Capital Needs and Debt Repayment Capacity Analysis\n"
+        "Calculate and evaluate the company’s working capital requirements, including:\n"
+        "   - Current working capital position (Current Assets – Current Liabilities).\n"
+        "   - Projected working capital needs based on historical trends, revenue growth forecasts, and operational cycles.\n"
+        "Assess the company’s capacity to service debt obligations, including:\n"
+        "   - Available cash flow relative to upcoming debt maturities.\n"
+        "   - Free Cash Flow (FCF) projections for short-term liquidity.\n"
+        "   - Net debt position and interest coverage ratio.\n"
+        "Discuss the sufficiency of current liquidity to meet both operational and financial obligations, with an emphasis on strategies to optimize working capital and debt servicing efficiency.\n"
+        "3. Key Risks Analysis Across Time Horizons 800 words.\n"
+        "Identify and assess risks using financial, operational, and market data:\n"
+        "   - Short term (<1 year): Risks like cash flow volatility, debt repayment pressures, and market disruptions.\n"
+        "   - Medium term (1–3 years): Challenges such as refinancing risks, operational scalability, and changing competitive dynamics.\n"
+        "   - Long term (>3 years): Strategic risks like technology disruption, regulatory shifts, and macroeconomic changes.\n"
+        "Provide a clear linkage between risks and the company’s financial health, credit rating, and capacity to meet future obligations.\n"
+        "4. Financial Predictions with Supporting Data. 900 words.\n"
+        "Forecast the company’s financial performance for the next three years, detailing:\n"
+        "   - Revenue growth, profitability trends, and expected changes in operating margins.\n"
+        "   - Projected credit rating trajectory based on forecasted metrics.\n"
+        "   - Working capital and cash flow projections tied to debt repayment schedules.\n"
+        "Use time-referenced insights to offer a clear rationale behind each prediction:\n"
+        "   - Best-case, base-case, and worst-case scenarios, including their respective probabilities.\n"
+        "Provide actionable insights into how these predictions align with the company’s financial strategy and operational goals.\n"
+        "5. Recommended Measures (Action-Oriented and Time-Specific).\n"
+        "Propose a comprehensive set of measures to:\n"
+        "   - Enhance liquidity and optimize working capital (e.g., faster receivables collection, inventory management improvements).\n"
+        "   - Improve creditworthiness by reducing leverage and increasing interest coverage ratios.\n"
+        "   - Strengthen financial performance to achieve or maintain a favorable credit rating.\n"
+        "Include SPECIFIC TIMELINES for implementation (short, medium, long term) and expected financial outcomes (e.g., reduced debt-to-equity ratio, improved FCF).\n"
+        "6. Advisory Modules with Titles and Abstracts.\n"
+        "Develop detailed advisory modules tailored to the company’s needs, including titles and abstracts:\n"
+        "Example Modules:\n"
+        "Module 1: \"Optimizing Working Capital: A Path to Enhanced Liquidity\"\n"
+        "Abstract: This module focuses on optimizing cash flows through efficient receivables, payables, and inventory management. It includes a step-by-step approach to reducing working capital needs by 10–15% within one year, improving liquidity and supporting debt repayment capacity.\n"
+        "Module 2: \"Achieving Investment-Grade Credit Ratings: A Strategic Blueprint\"\n"
+        "Abstract: This module provides a roadmap to achieving or maintaining an investment-grade credit rating by enhancing profitability, reducing leverage, and improving operational efficiency. The plan includes specific ratio targets, timelines, and resource requirements.\n"
+        "Module 3: \"Debt Management and Refinancing Strategies for Long-Term Stability\"\n"
+        "Abstract: This module helps the company assess its current debt portfolio, identify refinancing opportunities, and develop a long-term strategy to manage interest obligations and maturities. It includes projections of debt servicing costs under various scenarios.\n"
+    )
+
+def why_this_happens_prompt() -> str:
+    """Prompt for the root cause analysis."""
+    return (
+        "Based on the trends uncovered in the data provided, explain 5 reasons "
+        "possible root causes and implications.\n\n"
+        "if financial data exists, please include time references and periods of which they incur as part of the analysis\n"
+        "Requirements:\n"
+        "1. Total Analysis Length: 1300 words\n"
+        "2. For each root cause:\n"
+        "   - Supporting facts, figures and examples\n"
+        "   - Explanation of which aspects should concern the Board and why\n"
+        "3. Focus on supportable trend analysis only - no solutions required\n"
+        "4. Create a summary table of key findings in a table format\n"
+        "Note: For each point and section (except for the table part), make sure you provide in depth statistics, supporting facts, figures to support each assertion, as well as quoting the sources from where the data is obtained. From the data provided, contextualise and synthesize with the analysis.\n"
+        "5. Present the information as a conceptual model in a framework format in a long paragraph:300 words. "
+    )
+
+def what_could_happen_prompt() -> str:
+    """Prompt for the scenario analysis."""
+    return (
+        "Based on the trends and consideration of the possible root causes from "
+        "the data provided, explain possible scenarios.\n\n"
+        "if financial data exists, please include time references and periods of which they incur as part of the analysis\n"
+        "Requirements:\n"
+        "1. Scenario Analysis (1800 words total):\n"
+        "   - Worst case scenario (600 words)\n"
+        "   - Base case scenario (600 words)\n"
+        "   - Best case scenario (600 words)\n"
+        "2. Additional Analysis (1300 words):\n"
+        "   - Likelihood assessment for each scenario\n"
+        "   - Explanation of why each scenario might occur\n"
+        "3. Create a summary table of key findings in a table format\n"
+        "Note: For each point and section (except for the table part), make sure you provide in depth statistics, supporting facts, figures to support each assertion, as well as quoting the sources from where the data is obtained. From the data provided, contextualise and synthesize with the analysis.\n"
+        "4. Develop a framework table USING A TABLE  to visualize the relationships in this narrative"
+    )
+
+def board_considerations_prompt() -> str:
+    """Prompt for the Board considerations analysis."""
+    return (
+        "Based on the trends, diagnosis, outlook and from the data provided, "
+        "explain possible scenarios.\n\n"
+        "if financial data exists, please include time references and periods of which they incur as part of the analysis\n"
+        "Requirements:\n"
+        "1. Total Analysis Length: 1300 words\n"
+        "2. Analysis should cover:\n"
+        "   - Strategic implications\n"
+        "   - Risk considerations\n"
+        "   - Governance aspects\n"
+        "   - Recommended actions\n"
+        "3. Create a summary table of key findings in a table format\n"
+        "Note: For each point and section(except for the table part), make sure you provide in depth statistics, supporting facts, figures to support each assertion, as well as quoting the sources from where the data is obtained. From the data provided, contextualise and synthesize with the analysis.\n"
+        "4. Present the information as a conceptual mode in a framework format"
+        "5. Explain the conceptual framework with forward looking advice to the Board in a long paragraph: 300 words"
+    )
+
+# Prompt builders by analysis type, in board pack order
+ANALYSIS_PROMPTS = {
+    'whats_happening': whats_happening_prompt,
+    'why_this_happens': why_this_happens_prompt,
+    'what_could_happen': what_could_happen_prompt,
+    'what_should_board_consider': board_considerations_prompt
+}
+
+# Analyses each one builds on, following its prompt: causes from trends, scenarios
+# from trends and causes, Board considerations from all three
+ANALYSIS_DEPENDENCIES = {
+    'whats_happening': [],
+    'why_this_happens': ['whats_happening'],
+    'what_could_happen': ['whats_happening', 'why_this_happens'],
+    'what_should_board_consider': ['whats_happening', 'why_this_happens', 'what_could_happen']
+}
+
+def analysis_order(targets: List[str]) -> List[str]:
+    """Targets plus everything they depend on, dependencies first."""
+    order = []
+
+    def visit(analysis_type):
+        if analysis_type in order:
+            return
+        for dependency in ANALYSIS_DEPENDENCIES[analysis_type]:
+            visit(dependency)
+        order.append(analysis_type)
+
+    for target in targets:
+        visit(target)
+    return order
+
+def run_analysis_graph(text: str, targets: List[str], client: OpenAI, force: bool = False,
+                       on_complete: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+                       on_error: Optional[Callable[[str, Exception], Any]] = None,
+                       config: EngineConfig = DEFAULT_CONFIG,
+                       notify: Notify = log_notice,
+                       build_on_upstream: bool = True) -> Dict[str, Dict[str, Any]]:
+    """Run the targets and their dependencies, each as soon as its inputs are ready.
+
+    Every analysis sees the raw data plus the findings of the analyses it
+    depends on, and is memoized in the analysis cache under both, so earlier
+    findings are computed once per document. Independent analyses run in
+    parallel. ``force`` regenerates the targets only; dependencies are reused.
+    An analysis whose dependency failed is skipped and reported as failed too.
+    With ``build_on_upstream`` off, only the targets run, all at once and on
+    the raw data alone, as the board pack does to keep its wait to one analysis.
+    Callbacks run on the calling thread, in completion order.
+    """
+    if build_on_upstream:
+        dependencies_of = ANALYSIS_DEPENDENCIES
+        order = analysis_order(targets)
+    else:
+        dependencies_of = {analysis_type: [] for analysis_type in targets}
+        order = list(dict.fromkeys(targets))
+    prompts = {analysis_type: ANALYSIS_PROMPTS[analysis_type]() for analysis_type in order}
+    pending = list(prompts)
+    results = {}
+    failed = set()
+    running = {}
+    prepared_text = None
+
+    def fail(analysis_type, error):
+        failed.add(analysis_type)
+        if on_error:
+            on_error(analysis_type, error)
+
+    def complete(analysis_type, result):
+        results[analysis_type] = result
+        if on_complete:
+            on_complete(analysis_type, result)
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        while pending or running:
+            # Pending is in dependency order, so cache hits unblock later entries in the same sweep
+            for analysis_type in list(pending):
+                dependencies = dependencies_of[analysis_type]
+                blocked_by = [d for d in dependencies if d in failed]
+                if blocked_by:
+                    pending.remove(analysis_type)
+                    fail(analysis_type, RuntimeError(f"{REPORT_TITLES[blocked_by[0]]} is not available"))
+                    continue
+                if not all(d in results for d in dependencies):
+                    continue
+                pending.remove(analysis_type)
+                upstream = {d: results[d]["analysis"] for d in dependencies}
+                cache_key = analysis_cache_key(text, analysis_type, prompts[analysis_type], upstream, config)
+                if not (force and analysis_type in targets):
+                    cached = get_cached_analysis(cache_key, analysis_type)
+                    if cached is not None:
+                        complete(analysis_type, cached)
+                        continue
+                if prepared_text is None:
+                    prepared_text = prepare_analysis_input(text, client, config, notify)
+                future = executor.submit(run_analysis, prepared_text, analysis_type,
+                                         prompts[analysis_type], client, upstream, config, notify)
+                running[future] = (analysis_type, cache_key)
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                analysis_type, cache_key = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    fail(analysis_type, e)
+                    continue
+                put_cached_analysis(cache_key, result)
+                complete(analysis_type, result)
+    return results
+
+# Minimum seconds between progress callbacks of a streaming analysis
+STREAM_UPDATE_INTERVAL = 0.15
+
+def stream_chat_completion(client: OpenAI, messages: List[Dict[str, str]], model: str = ANALYSIS_MODEL,
+                           deadline: float = ANALYSIS_DEADLINE,
+                           on_text: Optional[Callable[[str], Any]] = None) -> str:
+    """Stream a chat completion and return the full text.
+
+    Deltas are collected in a list and ``on_text`` gets the text so far at
+    most every STREAM_UPDATE_INTERVAL seconds, so long outputs aren't
+    re-joined per token. A stream that fails part-way is restarted from the
+    beginning under the shared retry policy. The request timeout only bounds
+    each read, so the deadline is also checked between events and a stream
+    still running when it passes is closed.
+    """
+    quiet_client = client.with_options(max_retries=0)
+
+    def consume(timeout: float) -> str:
+        parts = []
+        last_update = 0.0
+        expires = time.monotonic() + timeout
+        stream = quiet_client.chat.completions.create(
+            model=model, messages=messages, stream=True, timeout=max(1.0, timeout)
+        )
+        with stream:
+            for event in stream:
+                if time.monotonic() >= expires:
+                    raise TimeoutError(f"The analysis did not finish within {deadline:.0f} seconds.")
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                now = time.monotonic()
+                if on_text and now - last_update >= STREAM_UPDATE_INTERVAL:
+                    on_text("".join(parts))
+                    last_update = now
+        return "".join(parts)
+
+    return call_with_retry(consume, deadline=deadline)
+
+def resolve_upstream(text: str, analysis_type: str, client: OpenAI, config: EngineConfig = DEFAULT_CONFIG,
+                     notify: Notify = log_notice) -> Dict[str, str]:
+    """Findings of the analyses ``analysis_type`` builds on, running any not yet available."""
+    dependencies = ANALYSIS_DEPENDENCIES[analysis_type]
+    if not dependencies:
+        return {}
+    notify('info', f"Preparing the analyses this one builds on: {', '.join(REPORT_TITLES[t] for t in dependencies)}...")
+    errors = {}
+    results = run_analysis_graph(text, dependencies, client, on_error=lambda t, e: errors.setdefault(t, e),
+                                 config=config, notify=notify)
+    if errors:
+        failed_type, error = next(iter(errors.items()))
+        raise RuntimeError(f"{REPORT_TITLES[failed_type]} could not be prepared: {str(error)}")
+    return {t: results[t]["analysis"] for t in dependencies}
+
+def stream_analysis(text: str, analysis_type: str, prompt: str, client: OpenAI, force: bool = False,
+                    config: EngineConfig = DEFAULT_CONFIG, notify: Notify = log_notice,
+                    on_text: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    """Run one analysis of the raw input, streaming its text to ``on_text`` as it is written.
+
+    Builds on and shares the cache with run_analysis_graph: missing upstream
+    findings are computed first, and a cached result is returned without
+    calling the model unless ``force`` is set. Errors propagate to the caller.
+    """
+    upstream = resolve_upstream(text, analysis_type, client, config, notify)
+    cache_key = analysis_cache_key(text, analysis_type, prompt, upstream, config)
+    if not force:
+        result = get_cached_analysis(cache_key, analysis_type)
+        if result is not None:
+            return result
+
+    prepared_text = prepare_analysis_input(text, client, config, notify)
+    messages = build_analysis_messages(prompt, prepared_text, upstream, config, notify)
+    notify('info', f"Writing {REPORT_TITLES[analysis_type]}...")
+    analysis_text = stream_chat_completion(client, messages, config.analysis_model, config.analysis_deadline, on_text)
+    try:
+        cleaned_analysis = clean_text_anomalies(analysis_text)
+    except Exception as e:
+        notify('warning', f"Text cleaning encountered an error: {str(e)}. Using original text.")
+        cleaned_analysis = analysis_text
+    result = make_result(analysis_type, cleaned_analysis)
+    put_cached_analysis(cache_key, result)
+    return result
+
+def make_board_pack(sections: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """One result holding the finished sections, in board pack order."""
+    return {
+        "analysis_type": "board_pack",
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sections": [sections[t] for t in ANALYSIS_PROMPTS if t in sections]
+    }
+
+# Modules the pipeline imports on first use, loaded ahead of time by prewarm
+PREWARM_MODULES = ['openai', 'tiktoken', 'PyPDF2', 'pdf_extract', 'PIL.Image', 'report_pdf']
+
+_prewarm_started = False
+_prewarm_lock = threading.Lock()
+
+def prewarm() -> None:
+    """Import the heavy modules and build the shared tokenizer and report assets.
+
+    Failures are only logged; whatever needed the resource will report them.
+    """
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Prewarm could not import {name}: {str(e)}")
+    try:
+        get_encoding()
+    except Exception as e:
+        logger.warning(f"Prewarm could not load the tokenizer: {str(e)}")
+    try:
+        import report_pdf
+        report_pdf.get_render_context()
+    except Exception as e:
+        logger.warning(f"Prewarm could not load the report assets: {str(e)}")
+
+def start_prewarm() -> None:
+    """Run prewarm once per process on a background thread."""
+    global _prewarm_started
+    with _prewarm_lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+    threading.Thread(target=prewarm, name='prewarm', daemon=True).start()
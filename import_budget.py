@@ -0,0 +1,73 @@
+"""Check the app's cold-start import cost.
+
+    python import_budget.py [--module pdf6] [--budget-ms N] [--runs N]
+
+Imports the app in a fresh interpreter under ``python -X importtime``, with
+Streamlit already loaded so only our own modules are measured. Fails when a
+library the pipeline loads on first use is imported up front, or when the
+import takes longer than the budget (best of several runs).
+"""
+import re
+import sys
+import argparse
+import subprocess
+from typing import List, Tuple
+
+# Importing the app, Streamlit excluded, should stay well under this
+DEFAULT_BUDGET_MS = 100
+DEFAULT_RUNS = 3
+# Loaded on first use or by the prewarm hook, never while the first page is drawn
+LAZY_MODULES = ['openai', 'tiktoken', 'PyPDF2', 'PIL', 'reportlab', 'requests']
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def measure_import(module: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Import time of ``module`` in ms, and (name, self time in ms) of every module it loaded."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import streamlit; import {module}"],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    loaded = []
+    after_streamlit = False
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        if not indent and name == 'streamlit':
+            after_streamlit = True
+        elif not indent and name == module:
+            return cumulative_us / 1000, loaded
+        elif after_streamlit:
+            loaded.append((name, self_us / 1000))
+    raise RuntimeError(f"{module} did not show up in the import timings")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the app's cold-start import cost.")
+    parser.add_argument('--module', default='pdf6', help="module to import (default: pdf6)")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"import time budget in ms, Streamlit excluded (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                        help=f"fresh interpreters to measure, best one counts (default: {DEFAULT_RUNS})")
+    args = parser.parse_args(argv)
+
+    best_ms, loaded = min((measure_import(args.module) for _ in range(max(1, args.runs))),
+                          key=lambda measurement: measurement[0])
+    print(f"import {args.module}: {best_ms:.1f} ms (budget {args.budget_ms:.0f} ms), {len(loaded)} modules loaded")
+    for name, self_ms in sorted(loaded, key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {self_ms:7.1f} ms  {name}")
+
+    eager = sorted({name.split('.')[0] for name, _ in loaded} & set(LAZY_MODULES))
+    if eager:
+        print(f"Loaded at import time but meant to load on first use: {', '.join(eager)}")
+    if best_ms > args.budget_ms:
+        print(f"Over budget by {best_ms - args.budget_ms:.1f} ms")
+    return 1 if eager or best_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple
+
+# Summaries, analyses and board packs run here instead of inside a Streamlit
+# script run, so a rerun or a closed tab never cancels them. Jobs are keyed by
+# session and document; the page polls them and picks up finished results.
+
+MAX_JOB_WORKERS = 8
+# Finished jobs are kept this long for the sessions that haven't collected them
+MAX_FINISHED_JOBS = 256
+
+# (session id, document key, job kind)
+JobKey = Tuple[str, str, str]
+
+
+def document_key(text: str) -> str:
+    """Stable key for a document's text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Job:
+    """One unit of background work and everything the page shows about it.
+
+    The worker thread updates ``message`` and ``partial`` as it goes;
+    warnings and errors it reports are kept for when the result is collected.
+    """
+    key: JobKey
+    label: str
+    status: str = 'queued'  # queued, running, done or failed
+    message: str = ""
+    partial: Any = None
+    warnings: List[Tuple[str, str]] = field(default_factory=list)
+    result: Any = None
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    collected: bool = False
+    _finished: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+    def notify(self, level: str, message: str) -> None:
+        """Engine notify callback: info becomes the progress message, the rest is kept."""
+        if level == 'info':
+            self.message = message
+        else:
+            self.warnings.append((level, message))
+
+    def set_partial(self, partial: Any) -> None:
+        """Output produced so far, e.g. streamed text or finished sections."""
+        self.partial = partial
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes or ``timeout`` passes; returns whether it finished."""
+        return self._finished.wait(timeout)
+
+
+class JobExecutor:
+    """Thread pool that runs jobs and remembers them by key.
+
+    Submitting a key whose job is still queued or running returns that job,
+    so reruns and double clicks never start the same work twice; a finished
+    job is replaced by a fresh one.
+    """
+
+    def __init__(self, max_workers: int = MAX_JOB_WORKERS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, document: str, kind: str, label: str,
+               work: Callable[[Job], Any]) -> Job:
+        """Run ``work(job)`` in the background; its return value becomes the job's result."""
+        key = (session_id, document, kind)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.finished:
+                return job
+            job = Job(key=key, label=label)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._evict()
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Any]) -> None:
+        job.status = 'running'
+        try:
+            job.result = work(job)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.monotonic()
+            job._finished.set()
+
+    def _evict(self) -> None:
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[key]
+
+    def get(self, key: JobKey) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self, session_id: str) -> List[Job]:
+        """A session's jobs, oldest first."""
+        with self._lock:
+            return [job for key, job in self._jobs.items() if key[0] == session_id]
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_job_executor() -> JobExecutor:
+    """Process-wide executor, created on first use and shared by every session."""
+    global _default_executor
+    if _default_executor is None:
+        with _default_executor_lock:
+            if _default_executor is None:
+                _default_executor = JobExecutor()
+    return _default_executor
@@ -0,0 +1,161 @@
+import re
+import functools
+from html import unescape
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+# The markdown subset the analysis prompts produce: headings, bold-only title
+# lines, paragraphs, bullet and numbered lists, pipe tables, **bold** and *italic*.
+_HEADING_RE = re.compile(r'(#{1,6})\s*(.*?)[\s#]*$')
+_BOLD_LINE_RE = re.compile(r'\*\*([^*]+)\*\*:?$')
+_LIST_RE = re.compile(r'(?:([-*+•])|(\d+)[.)])\s+(.*)$')
+_RULE_RE = re.compile(r'([-*_])(?:\s*\1){2,}$')
+_TABLE_SEPARATOR_RE = re.compile(r'\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?$')
+_INLINE_RE = re.compile(r'\*\*(.+?)\*\*|(?<![\w*])\*(?![\s*])(.+?)(?<![\s*])\*(?![\w*])')
+
+
+@dataclass(frozen=True)
+class Span:
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+
+Inline = Tuple[Span, ...]
+
+
+@dataclass(frozen=True)
+class Heading:
+    level: int
+    content: Inline
+
+
+@dataclass(frozen=True)
+class Paragraph:
+    content: Inline
+
+
+@dataclass(frozen=True)
+class ListBlock:
+    ordered: bool
+    items: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class Table:
+    header: Tuple[Inline, ...]
+    rows: Tuple[Tuple[Inline, ...], ...]
+
+
+Block = Union[Heading, Paragraph, ListBlock, Table]
+
+
+def parse_inline(text: str) -> Inline:
+    """Split a line into plain, bold and italic spans."""
+    spans = []
+    position = 0
+    for match in _INLINE_RE.finditer(text):
+        if match.start() > position:
+            spans.append(Span(unescape(text[position:match.start()])))
+        if match.group(1) is not None:
+            spans.append(Span(unescape(match.group(1)), bold=True))
+        else:
+            spans.append(Span(unescape(match.group(2)), italic=True))
+        position = match.end()
+    if position < len(text):
+        spans.append(Span(unescape(text[position:])))
+    return tuple(spans)
+
+
+def split_table_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _parse_table(lines: List[str], start: int) -> Tuple[Optional[Table], int]:
+    """Parse a pipe table whose header is ``lines[start]``; returns it and the next line index."""
+    # Empty header cells are kept: "| | 2023 | 2024 |" is a three-column table
+    header = split_table_row(lines[start])
+    i = start + 2
+    rows = []
+    while i < len(lines) and '|' in lines[i]:
+        cells = split_table_row(lines[i])
+        # Rows are padded or trimmed to the header's column count
+        cells = (cells + [''] * len(header))[:len(header)]
+        rows.append(tuple(parse_inline(cell or '-') for cell in cells))
+        i += 1
+    if not any(header) or not rows:
+        return None, i
+    return Table(header=tuple(parse_inline(cell) for cell in header), rows=tuple(rows)), i
+
+
+def _is_table_start(lines: List[str], i: int) -> bool:
+    return (
+        '|' in lines[i]
+        and i + 1 < len(lines)
+        and '-' in lines[i + 1]
+        and _TABLE_SEPARATOR_RE.match(lines[i + 1].strip()) is not None
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def parse_markdown(text: str) -> Tuple[Block, ...]:
+    """Parse analysis markdown into blocks in one pass over its lines.
+
+    Each line is one paragraph, as the reports have always been laid out.
+    Pipe rows that don't form a table fall back to paragraphs. The result is
+    immutable and memoized, so every renderer of a result shares one parse.
+    """
+    lines = text.split('\n') if text else []
+    blocks = []
+    list_items = []
+    list_ordered = False
+
+    def flush_list():
+        if list_items:
+            blocks.append(ListBlock(ordered=list_ordered, items=tuple(list_items)))
+            list_items.clear()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line or _RULE_RE.match(line):
+            flush_list()
+            i += 1
+            continue
+
+        if _is_table_start(lines, i):
+            flush_list()
+            table, i = _parse_table(lines, i)
+            if table is not None:
+                blocks.append(table)
+            continue
+
+        list_match = _LIST_RE.match(line)
+        if list_match:
+            ordered = list_match.group(2) is not None
+            if list_items and ordered != list_ordered:
+                flush_list()
+            list_ordered = ordered
+            list_items.append(parse_inline(list_match.group(3)))
+            i += 1
+            continue
+
+        flush_list()
+        heading_match = _HEADING_RE.match(line) if line.startswith('#') else None
+        bold_match = _BOLD_LINE_RE.match(line)
+        if heading_match:
+            if heading_match.group(2):
+                blocks.append(Heading(level=len(heading_match.group(1)), content=parse_inline(heading_match.group(2))))
+        elif bold_match:
+            blocks.append(Heading(level=3, content=(Span(unescape(bold_match.group(1).strip())),)))
+        else:
+            blocks.append(Paragraph(content=parse_inline(line)))
+        i += 1
+
+    flush_list()
+    return tuple(blocks)
@@ -0,0 +1,240 @@
+import io
+import os
+import re
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import PyPDF2
+
+# Documents shorter than this are extracted in-process; pool overhead isn't worth it
+PARALLEL_MIN_PAGES = 40
+# Each task parses the PDF once, so keep ranges large enough to amortise that
+MIN_PAGES_PER_TASK = 10
+MAX_PDF_WORKERS = int(os.environ.get('BADEA_PDF_WORKERS', min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Process-wide extraction pool, started on first use.
+
+    Uses the spawn start method: the Streamlit server is multi-threaded, and
+    forking a threaded process is unsafe.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=MAX_PDF_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def open_pdf(pdf_bytes: bytes) -> PyPDF2.PdfReader:
+    """Open a PDF, unlocking it if it is only protected by an empty user password."""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    if reader.is_encrypted:
+        reader.decrypt('')
+    return reader
+
+
+def extract_page_range(pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop); runs inside a pool worker."""
+    reader = open_pdf(pdf_bytes)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def split_page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, about two per worker for load balancing."""
+    size = max(MIN_PAGES_PER_TASK, -(-page_count // max(1, workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pdf_pages(pdf_bytes: bytes, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Extract text page by page, returning one string per page in page order.
+
+    Only pages [start, stop) are extracted. Large ranges are spread over the
+    process pool; the per-range results are concatenated as lists, never as
+    growing strings.
+    """
+    reader = open_pdf(pdf_bytes)
+    page_count = len(reader.pages)
+    stop = page_count if stop is None else min(stop, page_count)
+    if stop - start < PARALLEL_MIN_PAGES or MAX_PDF_WORKERS <= 1:
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+    ranges = [(start + a, start + b) for a, b in split_page_ranges(stop - start, MAX_PDF_WORKERS)]
+    pool = get_pdf_pool()
+    futures = [pool.submit(extract_page_range, pdf_bytes, a, b) for a, b in ranges]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+# Rough bytes of shown text per token, used before any real extraction
+PREFLIGHT_BYTES_PER_TOKEN = 4
+# String operands of text-showing operators: (literal) and <hex> strings
+_PDF_STRING_RE = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]+>')
+# Form XObjects nested deeper than this are not inspected
+MAX_FORM_DEPTH = 4
+
+
+@dataclass
+class PageInfo:
+    index: int
+    has_text: bool
+    estimated_tokens: int
+
+
+@dataclass
+class PdfPreflight:
+    page_count: int
+    encrypted: bool
+    readable: bool
+    pages: List[PageInfo] = field(default_factory=list)
+
+    @property
+    def estimated_tokens(self) -> int:
+        return sum(page.estimated_tokens for page in self.pages)
+
+    @property
+    def pages_without_text(self) -> List[int]:
+        return [page.index for page in self.pages if not page.has_text]
+
+    def pages_within_budget(self, max_tokens: int, max_pages: Optional[int] = None) -> int:
+        """Number of leading pages whose estimated tokens fit in ``max_tokens``."""
+        total = 0
+        limit = len(self.pages) if max_pages is None else min(max_pages, len(self.pages))
+        for i in range(limit):
+            total += self.pages[i].estimated_tokens
+            if total > max_tokens:
+                return max(1, i)
+        return limit
+
+
+def _page_content_bytes(page) -> bytes:
+    contents = page.get('/Contents')
+    if contents is None:
+        return b''
+    contents = contents.get_object()
+    if isinstance(contents, PyPDF2.generic.ArrayObject):
+        return b'\n'.join(part.get_object().get_data() for part in contents)
+    return contents.get_data()
+
+
+def _form_content_bytes(page) -> List[bytes]:
+    """Content streams of the Form XObjects a page can draw, nested forms included.
+
+    Generators and scanners often place a page's text inside a form rather
+    than in the page's own content stream. Unreadable forms are skipped.
+    """
+    streams, seen = [], set()
+    pending = [(page.get('/Resources'), 0)]
+    while pending:
+        resources, depth = pending.pop()
+        if resources is None or depth >= MAX_FORM_DEPTH:
+            continue
+        try:
+            xobjects = resources.get_object().get('/XObject')
+            refs = list(xobjects.get_object().values()) if xobjects is not None else []
+        except Exception:
+            continue
+        for ref in refs:
+            key = (ref.idnum, ref.generation) if isinstance(ref, PyPDF2.generic.IndirectObject) else id(ref)
+            if key in seen:
+                continue
+            seen.add(key)
+            try:
+                form = ref.get_object()
+                if form.get('/Subtype') != '/Form':
+                    continue
+                streams.append(form.get_data())
+            except Exception:
+                continue
+            pending.append((form.get('/Resources'), depth + 1))
+    return streams
+
+
+def inspect_page(index: int, page) -> PageInfo:
+    """Cheap text-layer check and token estimate from the raw content streams.
+
+    Decompressing the page's content stream and those of its Form XObjects is
+    far cheaper than ``extract_text``, which runs font decoding and layout
+    analysis.
+    """
+    try:
+        data = b'\n'.join([_page_content_bytes(page)] + _form_content_bytes(page))
+    except Exception:
+        return PageInfo(index=index, has_text=False, estimated_tokens=0)
+    if b'BT' not in data:
+        return PageInfo(index=index, has_text=False, estimated_tokens=0)
+    shown = 0
+    for match in _PDF_STRING_RE.finditer(data):
+        token = match.group()
+        # Hex strings spend two characters per byte
+        shown += (len(token) - 2) // 2 if token.startswith(b'<') else len(token) - 2
+    return PageInfo(index=index, has_text=shown > 0,
+                    estimated_tokens=shown // PREFLIGHT_BYTES_PER_TOKEN)
+
+
+class LazyPdf:
+    """Page index over an uploaded PDF with on-demand text extraction.
+
+    ``preflight`` inspects page structure without extracting text, so
+    oversized or unreadable uploads can be turned away right away. Page text
+    is then extracted only for the ranges that are asked for, and each page
+    is extracted at most once.
+    """
+
+    def __init__(self, pdf_bytes: bytes):
+        self.pdf_bytes = pdf_bytes
+        self._reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        self._preflight = None
+        self._pages = {}
+
+    def preflight(self) -> PdfPreflight:
+        if self._preflight is None:
+            reader = self._reader
+            encrypted = reader.is_encrypted
+            readable = True
+            if encrypted:
+                try:
+                    # Many "encrypted" PDFs only restrict printing and open with an empty password
+                    readable = bool(reader.decrypt(''))
+                except Exception:
+                    readable = False
+            pages = []
+            page_count = 0
+            if readable:
+                page_count = len(reader.pages)
+                pages = [inspect_page(i, page) for i, page in enumerate(reader.pages)]
+            self._preflight = PdfPreflight(page_count=page_count, encrypted=encrypted,
+                                           readable=readable, pages=pages)
+        return self._preflight
+
+    @property
+    def page_count(self) -> int:
+        return self.preflight().page_count
+
+    def page_text(self, index: int) -> str:
+        if index not in self._pages:
+            self._pages[index] = self._reader.pages[index].extract_text() or ""
+        return self._pages[index]
+
+    def extract_pages(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Text of pages [start, stop), extracting only pages not seen yet."""
+        stop = self.page_count if stop is None else min(stop, self.page_count)
+        missing = [i for i in range(start, stop) if i not in self._pages]
+        if len(missing) >= PARALLEL_MIN_PAGES:
+            # Hand large contiguous gaps to the process pool
+            first, last = missing[0], missing[-1] + 1
+            for offset, text in enumerate(extract_pdf_pages(self.pdf_bytes, start=first, stop=last)):
+                self._pages.setdefault(first + offset, text)
+        return [self.page_text(i) for i in range(start, stop)]
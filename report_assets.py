@@ -0,0 +1,35 @@
+import threading
+from typing import Dict, Optional
+
+# Font role -> built-in PDF font. These need no font files and nothing is
+# downloaded or registered while rendering; every role is one Helvetica face
+REPORT_FONTS = {
+    'regular': 'Helvetica',
+    'bold': 'Helvetica-Bold',
+    'italic': 'Helvetica-Oblique',
+}
+LOGO_PATH = "badea.jpeg"
+
+_logo = None
+_logo_loaded = False
+_lock = threading.Lock()
+
+
+def report_fonts() -> Dict[str, str]:
+    """Font name for each role used by the report styles."""
+    return dict(REPORT_FONTS)
+
+
+def load_logo(path: str = LOGO_PATH) -> Optional[bytes]:
+    """Bytes of the report logo, read from disk once per process; None if it is missing."""
+    global _logo, _logo_loaded
+    if not _logo_loaded:
+        with _lock:
+            if not _logo_loaded:
+                try:
+                    with open(path, 'rb') as f:
+                        _logo = f.read()
+                except OSError:
+                    _logo = None
+                _logo_loaded = True
+    return _logo
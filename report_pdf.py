@@ -0,0 +1,400 @@
+import logging
+import functools
+import threading
+from io import BytesIO
+from html import escape
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle, Image, PageBreak
+from reportlab.platypus.tableofcontents import TableOfContents
+
+import markdown_ast as md
+from engine import REPORT_TITLES, Notify, log_notice
+from report_assets import load_logo, report_fonts
+
+# PDF reports for analysis results. ReportLab is slow to import, so the engine
+# loads this module on the first render (or from prewarm) rather than at startup.
+
+logger = logging.getLogger(__name__)
+
+def create_styles(fonts: Optional[Dict[str, str]] = None) -> Dict[str, ParagraphStyle]:
+    """Create report styles in the report fonts (see report_fonts)"""
+    fonts = fonts or report_fonts()
+    styles = {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            fontName=fonts['bold'],
+            fontSize=16,
+            spaceAfter=20,
+            textColor=colors.black,
+            leading=20
+        ),
+        'header': ParagraphStyle(
+            'CustomHeader',
+            fontName=fonts['bold'],
+            fontSize=14,
+            spaceAfter=10,
+            textColor=colors.black,
+            leading=18
+        ),
+        'subheading': ParagraphStyle(
+            'CustomSubheading',
+            fontName=fonts['bold'],
+            fontSize=10,
+            textColor=colors.black,
+            leading=12,
+            spaceBefore=6,
+            spaceAfter=6
+        ),
+        'content': ParagraphStyle(
+            'CustomContent',
+            fontName=fonts['regular'],
+            fontSize=10,
+            textColor=colors.black,
+            leading=12,
+            spaceBefore=6,
+            spaceAfter=6
+        ),
+        'metadata': ParagraphStyle(
+            'CustomMetadata',
+            fontName=fonts['regular'],
+            fontSize=9,
+            textColor=colors.black,
+            leading=12,
+            spaceBefore=6,
+            spaceAfter=6
+        ),
+        'bullet': ParagraphStyle(
+            'CustomBullet',
+            fontName=fonts['regular'],
+            fontSize=10,
+            textColor=colors.black,
+            leading=12,
+            leftIndent=14,
+            bulletIndent=2,
+            spaceBefore=2,
+            spaceAfter=2
+        )
+    }
+    return styles
+
+PDF_DISCLAIMER_TEXT = (
+    "Disclaimer: This analysis is provided for informational purposes only and "
+    "should not be considered as financial, legal, or investment advice. "
+    "The content is generated using artificial intelligence and may require verification. "
+    "Users should exercise their own judgment and consult appropriate professionals "
+    "before making any decisions based on this information. "
+    "© BADEA © CEAI All rights reserved."
+)
+
+def create_disclaimer_style(fonts: Optional[Dict[str, str]] = None) -> ParagraphStyle:
+    fonts = fonts or report_fonts()
+    return ParagraphStyle(
+        'Disclaimer',
+        fontName=fonts['italic'],
+        fontSize=8,
+        textColor=colors.gray,
+        alignment=1,  # Center alignment
+        leading=10
+    )
+
+def create_report_doc(buffer: BytesIO, doc_class=SimpleDocTemplate) -> SimpleDocTemplate:
+    """A4 document with the standard report margins"""
+    return doc_class(
+        buffer,
+        pagesize=A4,
+        rightMargin=25*mm,
+        leftMargin=25*mm,
+        topMargin=25*mm,
+        bottomMargin=25*mm
+    )
+
+@dataclass
+class ReportRenderContext:
+    """Everything reports share that is costly to rebuild: fonts, styles and the logo."""
+    fonts: Dict[str, str]
+    styles: Dict[str, ParagraphStyle]
+    disclaimer_style: ParagraphStyle
+    logo: Optional[bytes]
+
+_render_context = None
+_render_context_lock = threading.Lock()
+
+def get_render_context() -> ReportRenderContext:
+    """Process-wide render context, built on first use from the built-in fonts and the logo file."""
+    global _render_context
+    if _render_context is None:
+        with _render_context_lock:
+            if _render_context is None:
+                fonts = report_fonts()
+                _render_context = ReportRenderContext(
+                    fonts=fonts,
+                    styles=create_styles(fonts),
+                    disclaimer_style=create_disclaimer_style(fonts),
+                    logo=load_logo()
+                )
+    return _render_context
+
+def add_logo(elements: List[Any]) -> None:
+    """Add logo if available"""
+    logo = get_render_context().logo
+    if logo:
+        # A fresh file object per report; JPEG data is embedded without decoding
+        elements.append(Image(BytesIO(logo), width=220, height=40))
+        elements.append(Spacer(1, 20))
+
+def inline_markup(content: md.Inline) -> str:
+    """ReportLab paragraph markup for a run of spans"""
+    parts = []
+    for span in content:
+        text = escape(span.text, quote=False)
+        if span.bold:
+            text = f"<b>{text}</b>"
+        if span.italic:
+            text = f"<i>{text}</i>"
+        parts.append(text)
+    return "".join(parts)
+
+def build_table_data(table: md.Table, styles: Dict) -> List[List[Any]]:
+    header_row = [Paragraph(inline_markup(cell), styles['subheading']) for cell in table.header]
+    return [header_row] + [
+        [Paragraph(inline_markup(cell), styles['content']) for cell in row]
+        for row in table.rows
+    ]
+
+def build_analysis_elements(analysis_text: str, styles: Dict) -> List[Any]:
+    """Turn analysis markdown into header, paragraph, list and table flowables"""
+    elements = []
+    for block in md.parse_markdown(analysis_text):
+        if isinstance(block, md.Heading):
+            elements.append(Spacer(1, 12))
+            elements.append(Paragraph(inline_markup(block.content), styles['header']))
+            elements.append(Spacer(1, 8))
+        elif isinstance(block, md.Table):
+            table = create_formatted_table(build_table_data(block, styles), styles)
+            if table:
+                elements.append(Spacer(1, 12))
+                elements.append(table)
+                elements.append(Spacer(1, 12))
+            else:
+                # Fall back to one line of text per row
+                for row in (block.header,) + block.rows:
+                    elements.append(Paragraph(" | ".join(inline_markup(cell) for cell in row), styles['content']))
+                elements.append(Spacer(1, 8))
+        elif isinstance(block, md.ListBlock):
+            for number, item in enumerate(block.items, 1):
+                bullet = f"{number}." if block.ordered else "•"
+                elements.append(Paragraph(inline_markup(item), styles['bullet'], bulletText=bullet))
+            elements.append(Spacer(1, 8))
+        else:
+            elements.append(Paragraph(inline_markup(block.content), styles['content']))
+            elements.append(Spacer(1, 8))
+    return elements
+
+def create_styled_pdf_report(result: Dict[str, Any], analysis_type: str, notify: Notify = log_notice) -> bytes:
+    """Create a styled PDF report with proper table handling"""
+    buffer = BytesIO()
+    
+    try:
+        # Fonts, styles and logo are set up once per process
+        context = get_render_context()
+        
+        # Create PDF document
+        doc = create_report_doc(buffer)
+        
+        # Get styles
+        styles = context.styles
+        
+        # Initialize elements list
+        elements = []
+        add_logo(elements)
+        elements.append(Spacer(1, 20))
+        
+        # Then modify the title section to use this mapping
+        title_text = REPORT_TITLES.get(analysis_type, f"Analysis Report: {analysis_type.replace('_', ' ').title()}")
+        # Add title
+        # title_text = f"Report: {analysis_type.replace('_', ' ').title()}"
+        elements.append(Paragraph(title_text, styles['title']))
+
+        # Add metadata
+        metadata_text = f"Generated on: {result.get('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))}"
+        elements.append(Paragraph(metadata_text, styles['metadata']))
+        elements.append(Spacer(1, 20))
+        
+        # Process content
+        elements.extend(build_analysis_elements(result.get('analysis', ''), styles))
+
+        elements.append(Paragraph(PDF_DISCLAIMER_TEXT, context.disclaimer_style))
+
+        # Build PDF
+        doc.build(elements)
+        pdf_bytes = buffer.getvalue()
+        return pdf_bytes
+        
+    except Exception as e:
+        notify('error', f"Error creating PDF: {str(e)}")
+        return b''
+    finally:
+        buffer.close()
+
+class BoardPackDocTemplate(SimpleDocTemplate):
+    """Report template that feeds section titles to the table of contents"""
+    def afterFlowable(self, flowable):
+        if isinstance(flowable, Paragraph) and flowable.style.name == 'CustomTitle':
+            self.notify('TOCEntry', (0, flowable.getPlainText(), self.page))
+
+def create_board_pack_pdf(pack: Dict[str, Any], notify: Notify = log_notice) -> bytes:
+    """Create one PDF holding every board pack section, with a table of contents"""
+    buffer = BytesIO()
+    
+    try:
+        context = get_render_context()
+        doc = create_report_doc(buffer, BoardPackDocTemplate)
+        styles = context.styles
+        
+        elements = []
+        add_logo(elements)
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph("Board Pack", styles['header']))
+        elements.append(Paragraph(f"Generated on: {pack.get('timestamp', 'N/A')}", styles['metadata']))
+        elements.append(Spacer(1, 20))
+        
+        toc = TableOfContents()
+        toc.levelStyles = [styles['content']]
+        elements.append(toc)
+        
+        for section in pack['sections']:
+            elements.append(PageBreak())
+            elements.append(Paragraph(REPORT_TITLES.get(section['analysis_type'], 'Analysis Report'), styles['title']))
+            elements.append(Paragraph(f"Generated on: {section.get('timestamp', 'N/A')}", styles['metadata']))
+            elements.append(Spacer(1, 20))
+            elements.extend(build_analysis_elements(section.get('analysis', ''), styles))
+        
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph(PDF_DISCLAIMER_TEXT, context.disclaimer_style))
+        
+        # Two passes: the first collects page numbers for the table of contents
+        doc.multiBuild(elements)
+        return buffer.getvalue()
+        
+    except Exception as e:
+        notify('error', f"Error creating PDF: {str(e)}")
+        return b''
+    finally:
+        buffer.close()
+
+# Cell padding used by create_formatted_table, left plus right
+TABLE_CELL_PADDING = 12
+# Narrowest a column may get, however short its content
+TABLE_MIN_COL_WIDTH = 12*mm
+# Tables longer than this are laid out as LongTable, which splits across pages cheaply
+LONG_TABLE_MIN_ROWS = 20
+
+@functools.lru_cache(maxsize=8192)
+def word_width(word: str, font_name: str, font_size: float) -> float:
+    """Rendered width of one word; table cells repeat words a lot, so widths are cached"""
+    return pdfmetrics.stringWidth(word, font_name, font_size)
+
+def measure_cell(cell: Any) -> Tuple[float, float]:
+    """(natural width, width of the longest word) of a table cell, without padding"""
+    if isinstance(cell, Paragraph):
+        text, font_name, font_size = cell.getPlainText(), cell.style.fontName, cell.style.fontSize
+    else:
+        text, font_name, font_size = str(cell), 'Helvetica', 10
+    words = text.split()
+    if not words:
+        return 0.0, 0.0
+    widths = [word_width(word, font_name, font_size) for word in words]
+    space = word_width(' ', font_name, font_size)
+    return sum(widths) + space * (len(widths) - 1), max(widths)
+
+def content_column_widths(table_data: List[List[Any]], available_width: float) -> List[float]:
+    """Column widths that follow cell content and together fill ``available_width``.
+
+    Every column first gets room for its longest word; the remaining width is
+    shared out in proportion to how much each column still needs to fit its
+    longest cell on one line. If even the longest words don't fit, columns
+    are scaled down proportionally.
+    """
+    num_cols = len(table_data[0])
+    natural = [0.0] * num_cols
+    minimum = [0.0] * num_cols
+    for row in table_data:
+        for col, cell in enumerate(row[:num_cols]):
+            cell_width, longest_word = measure_cell(cell)
+            natural[col] = max(natural[col], cell_width)
+            minimum[col] = max(minimum[col], longest_word)
+    minimum = [max(TABLE_MIN_COL_WIDTH, width + TABLE_CELL_PADDING) for width in minimum]
+    natural = [max(minimum[col], natural[col] + TABLE_CELL_PADDING) for col in range(num_cols)]
+
+    if sum(minimum) >= available_width:
+        ratio = available_width / sum(minimum)
+        return [width * ratio for width in minimum]
+    spare = available_width - sum(minimum)
+    wanted = [natural[col] - minimum[col] for col in range(num_cols)]
+    if sum(wanted) <= spare:
+        # Everything fits on one line; share what's left in proportion to the natural widths
+        ratio = available_width / sum(natural)
+        return [width * ratio for width in natural]
+    return [minimum[col] + spare * wanted[col] / sum(wanted) for col in range(num_cols)]
+
+def create_formatted_table(table_data: List[List[Any]], styles: Dict) -> Table:
+    """Create formatted table with content-based column widths and error handling"""
+    if not table_data or len(table_data) < 2:  # Need at least header and one data row
+        return None
+
+    try:
+        # Validate table structure
+        num_cols = len(table_data[0])
+        if num_cols == 0:
+            logger.error("Invalid table structure: no columns found")
+            return None
+
+        # Calculate available width
+        available_width = A4[0] - (2 * 25*mm)  # Total width minus margins
+        col_widths = content_column_widths(table_data, available_width)
+
+        # Create table with calculated widths
+        table_class = LongTable if len(table_data) > LONG_TABLE_MIN_ROWS else Table
+        table = table_class(table_data, colWidths=col_widths, repeatRows=1)
+        
+        # Define table style
+        table.setStyle(TableStyle([
+            # Header styling
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F8F9F9')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('FONTNAME', (0, 0), (-1, 0), styles['subheading'].fontName),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            
+            # Content styling
+            ('FONTNAME', (0, 1), (-1, -1), styles['content'].fontName),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            
+            # Spacing
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+            
+            # Alternate row colors
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.HexColor('#F8F9F9'), colors.white])
+        ]))
+        
+        return table
+
+    except Exception as e:
+        logger.error(f"Table creation error: {str(e)}")
+        return None
+
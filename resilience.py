@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import time
+import random
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    import openai
+
+# Retry policy shared by every OpenAI call site
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+DEFAULT_DEADLINE = 120.0
+# Circuit breaker: open after this many consecutive provider outages, probe again after the cooldown
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+# How often callers waiting on an open breaker check whether another caller's probe closed it
+BREAKER_PROBE_POLL = 1.0
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, message: str, retry_in: float):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Process-wide breaker that stops hammering the provider during outages.
+
+    Closed: calls go through. After ``failure_threshold`` consecutive
+    failures it opens and rejects calls for ``cooldown`` seconds, then lets a
+    single probe call through (half-open); success closes it again.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(
+                    f"The analysis service is currently unavailable; please try again in {max(1, int(remaining))} seconds.",
+                    retry_in=max(remaining, BREAKER_PROBE_POLL)
+                )
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """End a call that says nothing about the provider, letting another caller probe."""
+        with self._lock:
+            self._probing = False
+
+
+default_breaker = CircuitBreaker()
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient provider errors: rate limits, timeouts, connection drops and 5xx."""
+    # Imported here so loading this module doesn't load openai; it is loaded by the time anything fails
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 408 or error.status_code == 409 or error.status_code >= 500
+    return False
+
+
+def is_outage(error: Exception) -> bool:
+    """Errors that say the provider is down: 5xx and connection failures.
+
+    Rate limits and anything sent with Retry-After come from a provider that
+    is up and pacing us, so they are retried without counting toward the breaker.
+    """
+    import openai
+
+    if retry_after_seconds(error) is not None:
+        return False
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def is_provider_answer(error: Exception) -> bool:
+    """4xx responses: the provider is up and answered, if not with a result.
+
+    Anything else raised by ``call``, such as a bug while consuming the
+    response, says nothing about the provider and leaves the breaker as it is.
+    """
+    import openai
+
+    return isinstance(error, openai.APIStatusError) and error.status_code < 500
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the provider through Retry-After headers, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        # HTTP-date form of Retry-After; fall back to our own backoff
+        return None
+    return None
+
+
+def backoff_delay(attempt: int, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def wait_for_breaker(breaker: CircuitBreaker, expires: float) -> None:
+    """Block until the breaker lets a call through, or raise if that won't happen before ``expires``."""
+    while True:
+        try:
+            breaker.before_call()
+            return
+        except CircuitOpenError as error:
+            if time.monotonic() + error.retry_in >= expires:
+                raise
+            time.sleep(error.retry_in)
+
+
+def call_with_retry(call: Callable[[float], Any], max_attempts: int = MAX_ATTEMPTS,
+                    deadline: float = DEFAULT_DEADLINE, breaker: CircuitBreaker = default_breaker) -> Any:
+    """Run ``call(timeout)`` with retries, a total deadline and the circuit breaker.
+
+    ``call`` receives the seconds left before the deadline so it can pass them
+    on as the request timeout. Non-transient errors are raised immediately.
+    An open breaker is waited out when its cooldown ends within the deadline.
+    """
+    expires = time.monotonic() + deadline
+    for attempt in range(max_attempts):
+        wait_for_breaker(breaker, expires)
+        remaining = expires - time.monotonic()
+        try:
+            result = call(remaining)
+        except Exception as error:
+            if is_outage(error):
+                breaker.record_failure()
+            elif is_provider_answer(error):
+                # The provider answered; a bad request or a rate limit says nothing about its health
+                breaker.record_success()
+            else:
+                breaker.release_probe()
+            if not is_retryable(error):
+                raise
+            delay = retry_after_seconds(error)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            if attempt == max_attempts - 1 or time.monotonic() + delay >= expires:
+                raise
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+def create_chat_completion(client: openai.OpenAI, deadline: float = DEFAULT_DEADLINE,
+                           max_attempts: int = MAX_ATTEMPTS, **kwargs) -> Any:
+    """``client.chat.completions.create`` behind the shared retry policy.
+
+    The client's own retries are switched off so attempts aren't multiplied.
+    """
+    quiet_client = client.with_options(max_retries=0)
+    return call_with_retry(
+        lambda timeout: quiet_client.chat.completions.create(timeout=max(1.0, timeout), **kwargs),
+        max_attempts=max_attempts,
+        deadline=deadline
+    )
@@ -0,0 +1,77 @@
+"""Golden outputs of engine.clean_text_anomalies.
+
+    python -m unittest test_clean_text
+
+Each case is a line as the analysis model writes it and the line the report
+shows. Two cases deliberately differ from the pass chain the single compiled
+pattern replaced: numbers keep their decimal point and thousands separator
+("3.5", "1,000" used to become "3. 5", "1, 000"), and a repeated "ing ing"
+is joined in one go instead of leaving the second "ing" behind.
+"""
+import unittest
+
+from engine import clean_text_anomalies
+
+GOLDEN = [
+    # Decimals and thousands separators stay whole; a space still follows . and , elsewhere
+    ("Margin rose to 3.5x while volume passed 1,000 units.",
+     "Margin rose to 3.5 x while volume passed 1,000 units."),
+    ("Net debt fell to 2,450.75 thousand,then rose again.",
+     "Net debt fell to 2,450.75 thousand, then rose again."),
+    ("Growth:5%.Outlook:stable.",
+     "Growth:5%. Outlook:stable."),
+    ("Costs rose 12%,driven by fuel .",
+     "Costs rose 12%, driven by fuel."),
+    # Numbers and letters are split apart
+    ("Revenue reached 3.5million in FY2024.",
+     "Revenue reached 3.5 million in FY 2024."),
+    ("ABCCorp reported Q3results above FY2023levels.",
+     "ABC Corp reported Q 3 results above FY 2023 levels."),
+    # Words split before "ing" are joined again
+    ("The company is process ing its backlog and expand ing margins.",
+     "The company is processing its backlog and expanding margins."),
+    ("The board is review ing ing the plan.",
+     "The board is reviewinging the plan."),
+    ("Ending the year strong.",
+     "Ending the year strong."),
+    # Joined words and parentheses
+    ("revenueGrowth slowed while EBITDAMargin widened.",
+     "revenue Growth slowed while EBITDA Margin widened."),
+    ("Key ratio:ROE improved(see note 4)and ROA held.",
+     "Key ratio:ROE improved (see note 4) and ROA held."),
+    ("(Note)The figures are unaudited.",
+     "( Note) The figures are unaudited."),
+    # Whitespace
+    ("Liquidity    remained\tadequate.",
+     "Liquidity remained adequate."),
+    ("  Leading and trailing spaces  ",
+     "Leading and trailing spaces"),
+    # Table rows and bullets are left exactly as written
+    ("| Metric | FY2024 |",
+     "| Metric | FY2024 |"),
+    ("- Bullet5million stays as written",
+     "- Bullet5million stays as written"),
+]
+
+
+class CleanTextGoldenTest(unittest.TestCase):
+    def test_golden_lines(self):
+        for line, expected in GOLDEN:
+            with self.subTest(line=line):
+                self.assertEqual(clean_text_anomalies(line), expected)
+
+    def test_lines_are_cleaned_independently(self):
+        text = "\n".join(line for line, _ in GOLDEN)
+        self.assertEqual(clean_text_anomalies(text), "\n".join(expected for _, expected in GOLDEN))
+
+    def test_empty_text(self):
+        self.assertEqual(clean_text_anomalies(""), "")
+
+    def test_cleaning_is_stable(self):
+        for _, expected in GOLDEN:
+            with self.subTest(line=expected):
+                self.assertEqual(clean_text_anomalies(expected), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()